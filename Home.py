@@ -1,12 +1,14 @@
 import streamlit as st
 import pandas as pd
+import folium
 from streamlit_folium import st_folium
 import time #to work with the time in the dataset
 from streamlit_autorefresh import st_autorefresh #allows the auto refresh of the dashbaord
 from streamlit_js_eval import streamlit_js_eval
 from data_loader import (load_live_sensor_data, load_sensor_locations, load_tram_metro_data, init_data_stream)
-from map_utils import (init_map, add_sensor_markers, add_sensor_labels, add_sensor_circles, add_flow_sensor_circles, add_sensor_arrows, add_flow_sensor_arrows, add_stops_circles, add_heatmap)
-from calculate_crowd_flow import calculate_crowd_flow
+from map_utils import (init_map, add_sensor_markers, add_sensor_labels, add_sensor_circles, add_flow_sensor_circles, add_sensor_arrows, add_flow_sensor_arrows, add_stops_circles, add_heatmap, add_heatmap_raster, BaseMap)
+from calculate_crowd_flow import add_new_row, calculate_crowd_flow
+from replay import get_replay_clock, replay_controls
 
 
 #Import function used for login - only activate upon final implementation
@@ -36,6 +38,35 @@ if 'logged_in' not in st.session_state:
 if 'username' not in st.session_state:
     st.session_state['username'] = None
 
+# Static map parts are cached per style and layer combination; see map_utils.BaseMap
+@st.cache_resource(show_spinner=False)
+def get_base_map(map_style, show_sensor_loc, show_sensor_labels, show_tram_metro_stops):
+    return BaseMap(map_style, load_sensor_locations(), load_tram_metro_data(),
+                   show_sensor_loc, show_sensor_labels, show_tram_metro_stops)
+
+def add_live_layers(m, sensor_loc, display_sensor_data):
+    """Adds the layers that change with every refresh (circles, arrows, heatmap) and returns the skipped rows."""
+    skipped_rows = set()
+    if st.session_state.show_sensor_data:
+        if st.session_state.use_alt_data: 
+            skipped_rows.update(add_flow_sensor_circles(m, sensor_loc, display_sensor_data))
+        else:
+            skipped_rows.update(add_sensor_circles(m, sensor_loc, display_sensor_data))
+
+    if st.session_state.show_sensor_arrows:
+        if st.session_state.use_alt_data: 
+            skipped_rows.update(add_flow_sensor_arrows(m, sensor_loc, display_sensor_data))
+        else:
+            skipped_rows.update(add_sensor_arrows(m, sensor_loc, display_sensor_data))
+
+    if st.session_state.show_heatmap:
+        if st.session_state.get("heatmap_engine", "client") == "server":
+            cache_key = (str(st.session_state.current_timestamp), st.session_state.use_alt_data)
+            skipped_rows.update(add_heatmap_raster(m, sensor_loc, display_sensor_data, cache_key))
+        else:
+            skipped_rows.update(add_heatmap(m, sensor_loc, display_sensor_data))
+    return skipped_rows
+
 def main():
     if "scroll_position" in st.session_state:
         restore_key = f"restore_scroll_{st.session_state.get('last_refresh', 0.0)}" 
@@ -49,12 +80,18 @@ def main():
     # Auto refresh  
     st_autorefresh(interval=REFRESH_INTERVAL * 1000, key="auto_refresher") #take time from refresh interval and convert to milliseconds
 
+    replay_controls()
+
     # Refresh data if the time interval has passed
     if time.time() - st.session_state.last_refresh > REFRESH_INTERVAL:
         sensor_data, timestamp = load_live_sensor_data()
         st.session_state.sensor_data = sensor_data
         st.session_state.current_timestamp = timestamp
-        crowd_flow = calculate_crowd_flow(st.session_state.current_timestamp)  # Updating crowd flow dataset for current timestamp
+        # the crowd flow comes from the history shared with the line graph, written once for all sessions
+        series = add_new_row(timestamp, get_replay_clock().generation, sensor_data)
+        crowd_flow = series.flows_at(timestamp)
+        if crowd_flow is None:
+            crowd_flow = calculate_crowd_flow(timestamp, sensor_data)  # not in the history (e.g. no data for it)
         st.session_state.crowd_flow = crowd_flow
         st.session_state.last_refresh = time.time()
 
@@ -99,45 +136,56 @@ def main():
     st.session_state.show_sensor_labels = st.sidebar.checkbox("Show Sensor IDs", value=st.session_state.get("show_sensor_labels", False))
     st.session_state.show_tram_metro_stops = st.sidebar.checkbox("Show Tram & Metro Stops", value=st.session_state.get("show_tram_metro_stops", False))
 
-    # Create map using the center and zoom from session state. This allows for the zoom to stay at the same level and not go back to a fixed level after a refresh
-    m = init_map(
-        map_style=st.session_state.map_style,
-        center=st.session_state.map_center,
-        zoom=st.session_state.map_zoom
-    )
-
-    all_skipped_rows = set() #creates a set for all of the missing rows for the visualisation
-
-    if st.session_state.show_sensor_data:
-        if st.session_state.use_alt_data: 
-            skipped = add_flow_sensor_circles(m, sensor_loc, display_sensor_data)
-        else:
-            skipped = add_sensor_circles(m, sensor_loc, display_sensor_data)
-        all_skipped_rows.update(skipped)
-
-    if st.session_state.show_sensor_arrows:
-        if st.session_state.use_alt_data: 
-            skipped = add_flow_sensor_arrows(m, sensor_loc, display_sensor_data)
-        else:
-            skipped = add_sensor_arrows(m, sensor_loc, display_sensor_data)
-        all_skipped_rows.update(skipped)
+    if st.session_state.get("map_engine", "folium") == "pydeck":
+        # GPU rendered map; only the sensor arrays are sent, no Leaflet HTML
+        from deck_map import build_deck
+        deck, all_skipped_rows = build_deck(
+            sensor_loc, display_sensor_data,
+            map_style=st.session_state.map_style,
+            center=st.session_state.map_center,
+            zoom=st.session_state.map_zoom,
+            flow=st.session_state.use_alt_data,
+            show_sensor_data=st.session_state.show_sensor_data,
+            show_sensor_arrows=st.session_state.show_sensor_arrows,
+            show_heatmap=st.session_state.show_heatmap,
+            show_sensor_loc=st.session_state.show_sensor_loc,
+            show_sensor_labels=st.session_state.show_sensor_labels,
+            tram_metro_gdf=tram_metro_stops_gpd if st.session_state.show_tram_metro_stops else None,
+            heatmap_cache_key=(str(current_timestamp), st.session_state.use_alt_data)
+                if st.session_state.get("heatmap_engine", "client") == "server" else None,
+        )
+        st.pydeck_chart(deck, use_container_width=True, height=700)
+        map_output = None # pydeck does not report the view back, so center/zoom stay as they are
+    elif st.session_state.get("static_base_map", True):
+        # Cached base map; a refresh only builds the live layers (st_folium still resends the unchanged base map script)
+        base_map = get_base_map(st.session_state.map_style, st.session_state.show_sensor_loc,
+                                st.session_state.show_sensor_labels, st.session_state.show_tram_metro_stops)
+        live_layers = folium.FeatureGroup(name="Live Sensor Data")
+        all_skipped_rows = base_map.skipped_rows | add_live_layers(live_layers, sensor_loc, display_sensor_data)
+        map_output = base_map.render([live_layers], center=st.session_state.map_center, zoom=st.session_state.map_zoom,
+                                     width=1200, height=700, key="folium_map")
+    else:
+        # Create map using the center and zoom from session state. This allows for the zoom to stay at the same level and not go back to a fixed level after a refresh
+        m = init_map(
+            map_style=st.session_state.map_style,
+            center=st.session_state.map_center,
+            zoom=st.session_state.map_zoom
+        )
 
-    if st.session_state.show_heatmap:
-        skipped = add_heatmap(m, sensor_loc, display_sensor_data)
-        all_skipped_rows.update(skipped)
+        all_skipped_rows = add_live_layers(m, sensor_loc, display_sensor_data) #creates a set for all of the missing rows for the visualisation
 
-    if st.session_state.show_sensor_loc:
-        skipped = add_sensor_markers(m, sensor_loc)
-        all_skipped_rows.update(skipped)
+        if st.session_state.show_sensor_loc:
+            skipped = add_sensor_markers(m, sensor_loc)
+            all_skipped_rows.update(skipped)
 
-    if st.session_state.show_sensor_labels:
-        skipped = add_sensor_labels(m, sensor_loc)
-        all_skipped_rows.update(skipped)
+        if st.session_state.show_sensor_labels:
+            skipped = add_sensor_labels(m, sensor_loc)
+            all_skipped_rows.update(skipped)
 
-    if st.session_state.show_tram_metro_stops:
-        add_stops_circles(m, tram_metro_stops_gpd)
+        if st.session_state.show_tram_metro_stops:
+            add_stops_circles(m, tram_metro_stops_gpd)
 
-    map_output = st_folium(m, width=1200, height=700, key="folium_map") #map size and map style
+        map_output = st_folium(m, width=1200, height=700, key="folium_map") #map size and map style
 
     if map_output and map_output.get("center") and map_output.get("zoom"):
         st.session_state.map_center = map_output["center"]
@@ -1,102 +1,173 @@
+import os
+import threading
+import numpy as np
 import pandas as pd
+import streamlit as st
 from data_loader import load_sensor_locations
 from data_loader import load_sensor_data
-
-
-# function to add rows with calculated crowd flow data to crowd_flow
-def calculate_crowd_flow(timestamp):
-    correct_time = str(timestamp) + "+02:00"
-    # load data sets
-    sensor_data = load_sensor_data()
-    sensor_locations = load_sensor_locations()
-
-
-    # makes crowd_flow a global variable that exists outside the function
-    global crowd_flow
-    # checks if crowd_flow doesn't exist
-    if "crowd_flow" not in globals():
-        # create empty data frame
-        crowd_flow = pd.DataFrame()
-
-
-        # add column names and remove useless columns
-        column_names = sensor_data.columns
-        for i in column_names:
-            crowd_flow[i] = ()
-
-        remove_columns = ["hour", "minute", "day", "month", "weekday", "is_weekend"]
-        for i in remove_columns:
-            crowd_flow = crowd_flow.drop(columns=i)
-
-
-    # checks if the data type of this column is numeric or something else (string, list...). 
-    # "dtype" looks for data type. "object" is non-numeric data type
-    if sensor_locations["Effectieve  breedte"].dtype == object:
-        # the data in sensor_locations is stored with a "," instead of a "." and first needs to be converted to a float value
-        sensor_locations["Effectieve  breedte"] = sensor_locations["Effectieve  breedte"].str.replace(",", ".").astype(float)
-    
-    
-    # checks if the index of crowd_flow is already timestamp
-    if crowd_flow.index.name != "timestamp":
-        # sets index to column timestamp so the function can later add rows to this data frame
-        crowd_flow.set_index("timestamp", inplace=True)
-
-
-    # gets the index of the respective row
-    row = sensor_data.index[sensor_data['timestamp'] == correct_time]
-    # list wich will be added to the dataframe
-    flow_data = []
-
-
-    for i in crowd_flow.columns:
-        # this skips the current iteration of the loop if the column = timestamp
-        if i == "timestamp":
-            continue
-
-        # gets the index of the respective row
-        another_row = sensor_locations.index[sensor_locations['sensor_id_full'] == i]
-
-        # empty rows might mess up the length of the list that will be appended, therefore an empty placeholder is added instead
-        if sensor_data[sensor_data['timestamp'] == correct_time].empty or sensor_locations[sensor_locations['sensor_id_full'] == i].empty:
-            flow_data.append(0)
-            continue
-
-        # calculates crowd flow as: number of people / width / time(3 mins)
-        flow_number = int(sensor_data.loc[row, i].iloc[0]) / float(sensor_locations.loc[another_row, "Effectieve  breedte"].iloc[0]) / 3
-        # adds the result of the calculation to the list flow_data
-        flow_data.append(flow_number)
-
-
-    # adds the crowd flow of the timestamp used in this function to the data frame crowd_flow
-    crowd_flow.loc[correct_time] = flow_data
-    dict = {col: [val] for col, val in crowd_flow.loc[correct_time].items()}
-
-    return dict
-
-
-# function to add rows for specific timestamp to new dataframe
-def add_new_row(timestamp):
+from ring_buffer import RingBuffer
+
+
+# columns in sensor_data that are not sensors and therefore have no crowd flow
+NON_SENSOR_COLUMNS = ["timestamp", "hour", "minute", "day", "month", "weekday", "is_weekend", "level_0", "index"]
+# every row in sensor_data counts the people passing a sensor over 3 minutes
+FLOW_INTERVAL_MINUTES = 3
+# how far back the shared count/flow history (crowd count line graph) keeps data
+HISTORY_HOURS = float(os.getenv("CROWD_HISTORY_HOURS", "24"))
+
+
+# every sensor count of sensor_data in one float matrix, shared by the flow calculation and the count history
+@st.cache_resource
+def load_count_matrix():
+    """
+    Returns the sensor counts of sensor_data as a DataFrame indexed by its timestamp strings, one column per sensor.
+    """
+    # the first row wins if a timestamp appears twice, like the old boolean mask lookup did
+    sensor_data = load_sensor_data().drop_duplicates(subset="timestamp")
+    sensor_columns = [col for col in sensor_data.columns if col not in NON_SENSOR_COLUMNS]
+    counts = sensor_data[sensor_columns].to_numpy(dtype=float)
+    # shared between all sessions, so it must be treated as read only
+    counts.flags.writeable = False
+    return pd.DataFrame(counts, index=pd.Index(sensor_data["timestamp"], name="timestamp"), columns=sensor_columns, copy=False)
+
+
+# builds the crowd flow for every timestamp and sensor at once, so a refresh only needs a row lookup
+@st.cache_resource
+def load_flow_matrix():
+    """
+    Precomputes crowd flow (number of people / effective width / time) for the whole dataset.
+    Returns a DataFrame indexed by the timestamp strings of sensor_data with one column per sensor.
+    """
+    count_matrix = load_count_matrix()
+    flow = flows_from_counts(count_matrix.to_numpy())
+
+    # shared between all sessions, so it must be treated as read only
+    flow.flags.writeable = False
+    return pd.DataFrame(flow, index=count_matrix.index, columns=count_matrix.columns, copy=False)
+
+
+def flows_from_counts(counts):
+    """
+    Crowd flow for counts in the column order of load_count_matrix (one row or a matrix of rows).
+    """
+    geometry = load_sensor_locations()
+    # effective widths come pre-parsed from the geometry table, aligned to the sensor columns;
+    # sensors without a location row get a flow of 0
+    widths, has_location = geometry.widths_for(list(load_count_matrix().columns))
+
+    flow = np.asarray(counts, dtype=float) / widths / FLOW_INTERVAL_MINUTES
+    flow[..., ~has_location] = 0
+    return flow
+
+
+def counts_from_sensor_data(sensor_data):
+    """Counts of a live sensor_data dict ({sensor: [count]}) in the column order of load_count_matrix; missing is NaN."""
+    return np.array([sensor_data.get(col, [np.nan])[0] for col in load_count_matrix().columns], dtype=float)
+
+
+# function to get the calculated crowd flow data for a timestamp
+# (live rows from an ingest adapter are not in sensor_data, so their flow is computed from sensor_data itself)
+def calculate_crowd_flow(timestamp, sensor_data=None):
     correct_time = str(timestamp) + "+02:00"
-    # load data sets
-    sensor_data = load_sensor_data()
-
-    # Remove unwanted columns if they exist
-    sensor_data = sensor_data.drop(columns=[col for col in ['level_0', 'index'] if col in sensor_data.columns])
-
-
-    # makes crowd_flow a global variable that exists outside the function
-    global count_frame
-    # checks if crowd_flow doesn't exist
-    if "count_frame" not in globals() or set(count_frame.columns) != set(sensor_data.columns):
-        # create empty data frame
-        count_frame = pd.DataFrame(columns=sensor_data.columns)
-
-
-    # Select the matching row
-    row_data = sensor_data[sensor_data["timestamp"] == correct_time]
-    # If a matching row exists
-    if not row_data.empty:
-        # Assign the values to a new row with this timestamp as index
-        count_frame.loc[correct_time] = row_data[count_frame.columns].iloc[0]
-
-    return count_frame
\ No newline at end of file
+    flow_matrix = load_flow_matrix()
+
+    # the timestamp index is a hash table, so this is a single lookup instead of a scan over sensor_data
+    try:
+        row = flow_matrix.values[flow_matrix.index.get_loc(correct_time)]
+    except KeyError:
+        if sensor_data is None:
+            # unknown timestamps get an empty placeholder for every sensor
+            return {col: [0] for col in flow_matrix.columns}
+        row = flows_from_counts(counts_from_sensor_data(sensor_data))
+
+    return {col: [val] for col, val in zip(flow_matrix.columns, row)}
+
+
+class SharedSeries:
+    """
+    Count and crowd flow history of the replay, shared by every session instead of one copy per session.
+    Each timestamp is looked up and written once, by whichever session asks first. Sessions only keep a
+    cursor (epoch, rows written) to see whether anything changed since their last read; the map reads its
+    crowd flow from here too (flows_at).
+    A jump of the replay clock (new generation) or a step back in time starts a new, empty history.
+    """
+
+    def __init__(self, count_matrix, flow_matrix, capacity):
+        self.count_matrix = count_matrix
+        self.flow_matrix = flow_matrix
+        self.capacity = capacity
+        self.generation = 0
+        self.epoch = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # callers hold the lock (or are __init__); readers keep using the old buffers they already hold
+        self.counts = RingBuffer(self.capacity, self.count_matrix.columns)
+        self.flows = RingBuffer(self.capacity, self.flow_matrix.columns)
+        self.epoch += 1
+
+    def record(self, timestamp, generation=0, sensor_data=None):
+        """
+        Adds the counts and flows of timestamp unless they are already the newest row.
+        Timestamps that are not in sensor_data (live ingest) are taken from the sensor_data dict of that row.
+        """
+        correct_time = str(timestamp) + "+02:00"
+        timestamp = pd.Timestamp(timestamp)
+        with self._lock:
+            last = self.counts.last_timestamp()
+            if generation != self.generation or (last is not None and timestamp < last):
+                self.generation = generation
+                self._reset()
+            elif last == timestamp:
+                return
+            # If a matching row exists
+            try:
+                row = self.count_matrix.index.get_loc(correct_time)
+            except KeyError:
+                if sensor_data is None:
+                    return
+                counts = counts_from_sensor_data(sensor_data)
+                self.counts.append(timestamp, counts)
+                self.flows.append(timestamp, flows_from_counts(counts))
+                return
+            self.counts.append(timestamp, self.count_matrix.values[row])
+            self.flows.append(timestamp, self.flow_matrix.values[row])
+
+    def flows_at(self, timestamp):
+        """Crowd flow of timestamp as {sensor: [flow]} if it is in the shared history, else None."""
+        target = np.datetime64(pd.Timestamp(timestamp), "ns")
+        # the search runs on zero-copy views, so it holds the lock that record() writes under
+        with self._lock:
+            timestamps, values = self.flows.view()
+            # timestamps only increase within one history, so this is a binary search
+            i = int(np.searchsorted(timestamps, target))
+            if i == len(timestamps) or timestamps[i] != target:
+                return None
+            row = values[i].copy()
+        return {col: [val] for col, val in zip(self.flows.columns, row)}
+
+    def cursor(self):
+        with self._lock:
+            return self.epoch, self.counts.total
+
+    def count_history(self, columns):
+        """(cursor, timestamps, counts of columns) copied in one step, so the rows always match the cursor."""
+        with self._lock:
+            timestamps, counts = self.counts.view()
+            positions = self.counts.columns.get_indexer(columns)
+            return (self.epoch, self.counts.total), timestamps.copy(), counts[:, positions]
+
+
+# one history for the whole server process, see SharedSeries
+@st.cache_resource
+def get_shared_series(hours=HISTORY_HOURS):
+    rows = int(hours * 60 / FLOW_INTERVAL_MINUTES)
+    return SharedSeries(load_count_matrix(), load_flow_matrix(), rows)
+
+
+# function to add the counts and flows of a specific timestamp to the shared history
+def add_new_row(timestamp, generation=0, sensor_data=None):
+    series = get_shared_series()
+    series.record(timestamp, generation, sensor_data)
+    return series
@@ -11,6 +11,7 @@ ROOT = Path(__file__).resolve().parent
 CARFLOW_SRC   = os.getenv("CARFLOW_SRC",  str(ROOT / "data" / "TomTom_data_20-24Aug2025.csv"))
 OUT_PARQUET   = os.getenv("CARFLOW_FLAT", str(ROOT / "data" / "carflow_flat.parquet"))
 OUT_CSV_GZ    = os.getenv("CARFLOW_FLAT_CSVGZ", str(ROOT / "data" / "carflow_flat.csv.gz"))
+CHUNK_BYTES   = 64 * 1024 * 1024  # raw bytes per parallel task (several per worker keeps the pool busy)
 
 # Time parser (robust to subsecond + timezone variants) 
 def _parse_time_iso8601_utc(s: pd.Series) -> pd.Series:
@@ -51,113 +52,207 @@ def _pack_carflow(rows):
     )
     return df
 
-# Stream-flatten the TomTom CSV:
-# Each outer row has TIME and a nested CSV string in DATA. Handle both
+# Flatten one outer row: TIME plus a nested CSV string in DATA. Handle both
 # comma- and semicolon-delimited inner formats; handle labeled ("id,traffic_level")
-# and unlabeled two-column inner schemas. Yields tidy DataFrames in batches. 
+# and unlabeled two-column inner schemas. Returns (time_raw, id, traffic_level) tuples.
+def _flatten_outer_row(t: str, inner: str) -> list:
+    # Try inner CSV with commas first
+    inner_io = StringIO(inner)
+    ir = csv.reader(inner_io, delimiter=",", quotechar='"')
+    hdr = next(ir, None)
+
+    # If header came as "id;traffic_level" in one token, switch to semicolons
+    if hdr and len(hdr) == 1 and ";" in hdr[0]:
+        inner_io = StringIO(inner)
+        ir = csv.reader(inner_io, delimiter=";", quotechar='"')
+        hdr = next(ir, None)
+
+    # If there's no header at all, attempt a simple "id,traffic_level" split
+    if not hdr:
+        txt = inner.replace("\n", "")
+        parts = [p.strip() for p in (txt.split(",") if "," in txt else txt.split(";"))]
+        return [(t, parts[0], parts[1])] if len(parts) == 2 else []
+
+    # Normalize header names
+    hdr = [h.strip().lower() for h in hdr]
+
+    # Labeled case: columns include "id" and "traffic_level"
+    if "id" in hdr and "traffic_level" in hdr:
+        id_i, tl_i = hdr.index("id"), hdr.index("traffic_level")
+        return [(t, r[id_i], r[tl_i]) for r in ir if len(r) > max(id_i, tl_i)]
+
+    # Unlabeled two-column pairs: (id, traffic_level)
+    rows = [(t, hdr[0], hdr[1])] if len(hdr) == 2 else []
+    rows.extend((t, r[0], r[1]) for r in ir if len(r) >= 2)
+    return rows
+
+def _time_data_columns(header):
+    cols = {h.strip().lower(): i for i, h in enumerate(header)}
+    t_idx, d_idx = cols.get("time"), cols.get("data")
+    if t_idx is None or d_idx is None:
+        raise ValueError(f"Expected 'time' and 'data' in header, got: {header}")
+    return t_idx, d_idx
+
+# Stream-flatten the TomTom CSV in one process. Yields tidy DataFrames in batches.
 def carflow_flat_iter(path: str, batch_rows: int = 250_000):
     _csv_field_unlimited()
     with open(path, "r", encoding="utf-8-sig", newline="") as f:
         outer = csv.reader(f, delimiter=",", quotechar='"')
-        header = next(outer)
-        cols = {h.strip().lower(): i for i, h in enumerate(header)}
-        t_idx, d_idx = cols.get("time"), cols.get("data")
-        if t_idx is None or d_idx is None:
-            raise ValueError(f"Expected 'time' and 'data' in header, got: {header}")
+        t_idx, d_idx = _time_data_columns(next(outer))
 
         buf = []
         for row in outer:
-            if not row or len(row) <= d_idx:
-                continue
-            t = row[t_idx]
-            inner = row[d_idx]
-            if not inner:
+            if not row or len(row) <= d_idx or not row[d_idx]:
                 continue
-
-            # Try inner CSV with commas first
-            inner_io = StringIO(inner)
-            ir = csv.reader(inner_io, delimiter=",", quotechar='"')
-            hdr = next(ir, None)
-
-            # If header came as "id;traffic_level" in one token, switch to semicolons
-            if hdr and len(hdr) == 1 and ";" in hdr[0]:
-                inner_io = StringIO(inner)
-                ir = csv.reader(inner_io, delimiter=";", quotechar='"')
-                hdr = next(ir, None)
-
-            # If there's no header at all, attempt a simple "id,traffic_level" split
-            if not hdr:
-                txt = inner.replace("\n", "")
-                parts = [p.strip() for p in (txt.split(",") if "," in txt else txt.split(";"))]
-                if len(parts) == 2:
-                    buf.append((t, parts[0], parts[1]))
-                if len(buf) >= batch_rows:
-                    yield _pack_carflow(buf); buf = []
-                continue
-
-            # Normalize header names
-            hdr = [h.strip().lower() for h in hdr]
-
-            # Labeled case: columns include "id" and "traffic_level"
-            if "id" in hdr and "traffic_level" in hdr:
-                id_i, tl_i = hdr.index("id"), hdr.index("traffic_level")
-                for r in ir:
-                    if len(r) <= max(id_i, tl_i):
-                        continue
-                    buf.append((t, r[id_i], r[tl_i]))
-                    if len(buf) >= batch_rows:
-                        yield _pack_carflow(buf); buf = []
-            else:
-                # Unlabeled two-column pairs: (id, traffic_level)
-                if len(hdr) == 2:
-                    buf.append((t, hdr[0], hdr[1]))
-                    if len(buf) >= batch_rows:
-                        yield _pack_carflow(buf); buf = []
-                for r in ir:
-                    if len(r) >= 2:
-                        buf.append((t, r[0], r[1]))
-                        if len(buf) >= batch_rows:
-                            yield _pack_carflow(buf); buf = []
+            buf.extend(_flatten_outer_row(row[t_idx], row[d_idx]))
+            if len(buf) >= batch_rows:
+                yield _pack_carflow(buf); buf = []
 
         # Flush remainder
         if buf:
             yield _pack_carflow(buf)
 
+# Parallel flattening
+# The raw file is cut into ~chunk_bytes pieces at outer-record boundaries: a newline preceded by an even
+# number of quote characters (escaped "" keep the parity), so a nested DATA field is never split.
+# Each piece is parsed in a worker process into its own Parquet part; the parts are merged in file order.
+def _record_boundaries(path: str, chunk_bytes: int = CHUNK_BYTES) -> list:
+    """Byte offsets [end of header, ..., file size]; consecutive offsets delimit one chunk of whole records."""
+    bounds = []
+    target, quotes, pos = 0, 0, 0  # the first boundary is the end of the header record
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(1 << 24)
+            if not block:
+                break
+            i = 0
+            while i < len(block):
+                # no boundary needed before target: just count the quotes up to it
+                if pos + i < target:
+                    j = min(target - pos, len(block))
+                    quotes += block.count(b'"', i, j)
+                    i = j
+                    continue
+                nl = block.find(b"\n", i)
+                if nl < 0:
+                    quotes += block.count(b'"', i)
+                    break
+                quotes += block.count(b'"', i, nl)
+                i = nl + 1
+                if quotes % 2 == 0:
+                    bounds.append(pos + i)
+                    target = pos + i + chunk_bytes
+            pos += len(block)
+    if not bounds or bounds[-1] < pos:
+        bounds.append(pos)
+    return bounds
+
+def _flatten_chunk(task):
+    """Worker: flattens the records in src[start:stop] into one Parquet part. Returns its row count."""
+    import pyarrow as pa, pyarrow.parquet as pq  # import here so module doesn't hard-depend on pyarrow
+    src, start, stop, t_idx, d_idx, part, batch_rows = task
+    # one fixed schema, so every part merges into the same Parquet file
+    schema = pa.schema([("time_utc", pa.timestamp("us", tz="UTC")), ("id", pa.int64()), ("traffic_level", pa.float64())])
+    _csv_field_unlimited()
+    with open(src, "rb") as f:
+        f.seek(start)
+        text = f.read(stop - start).decode("utf-8")
+
+    writer, total, buf = None, 0, []
+    def flush():
+        nonlocal writer, total
+        table = pa.Table.from_pandas(_pack_carflow(buf), schema=schema, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(part, schema, compression="snappy")
+        writer.write_table(table)
+        total += len(table)
+        buf.clear()
+
+    for row in csv.reader(StringIO(text), delimiter=",", quotechar='"'):
+        if not row or len(row) <= d_idx or not row[d_idx]:
+            continue
+        buf.extend(_flatten_outer_row(row[t_idx], row[d_idx]))
+        if len(buf) >= batch_rows:
+            flush()
+    if buf:
+        flush()
+    if writer:
+        writer.close()
+    return total
+
+def carflow_flat_parts(src: str, parts_dir: str, workers: int = os.cpu_count() or 1,
+                       chunk_bytes: int = CHUNK_BYTES, batch_rows: int = 250_000):
+    """
+    Flatten src in a pool of worker processes. Yields the Parquet part files in file order
+    (skipping chunks without rows), each as soon as it and all parts before it are done.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    bounds = _record_boundaries(src, chunk_bytes)
+    with open(src, "rb") as f:
+        header = next(csv.reader(StringIO(f.read(bounds[0]).decode("utf-8-sig"))))
+    t_idx, d_idx = _time_data_columns(header)
+
+    parts = [str(Path(parts_dir) / f"part-{k:05d}.parquet") for k in range(len(bounds) - 1)]
+    tasks = [(src, start, stop, t_idx, d_idx, part, batch_rows)
+             for start, stop, part in zip(bounds[:-1], bounds[1:], parts)]
+    print(f"[parallel] {len(tasks)} chunks on {workers} workers", flush=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part, rows in zip(parts, pool.map(_flatten_chunk, tasks)):  # map keeps the file order
+            if rows:
+                yield part
+
+def _carflow_tables(src: str, batch_rows: int, workers: int):
+    """Flattened data as pyarrow Tables in file order: streamed in-process, or via parallel Parquet parts."""
+    import pyarrow as pa, pyarrow.parquet as pq  # import here so module doesn't hard-depend on pyarrow
+    if workers <= 1:
+        for chunk in carflow_flat_iter(src, batch_rows=batch_rows):
+            yield pa.Table.from_pandas(chunk, preserve_index=False)
+        return
+    import tempfile
+    with tempfile.TemporaryDirectory(prefix="carflow_parts_") as parts_dir:
+        for part in carflow_flat_parts(src, parts_dir, workers=workers, batch_rows=batch_rows):
+            yield pq.read_table(part)
+            os.remove(part)
+
 # Writer: Parquet (fast & compact) 
-def write_carflow_parquet(src: str = CARFLOW_SRC, out_parquet: str = OUT_PARQUET, batch_rows: int = 500_000):
+def write_carflow_parquet(src: str = CARFLOW_SRC, out_parquet: str = OUT_PARQUET, batch_rows: int = 500_000,
+                          workers: int = 1):
     """
     Stream-flatten src into a Parquet file at out_parquet (Snappy compression).
+    With workers > 1 the raw file is parsed in parallel and the parts are merged in order.
     Requires pyarrow. Creates parent directories if needed.
     """
-    import pyarrow as pa, pyarrow.parquet as pq  # import here so module doesn't hard-depend on pyarrow
+    import pyarrow.parquet as pq  # import here so module doesn't hard-depend on pyarrow
     out = Path(out_parquet)
     out.parent.mkdir(parents=True, exist_ok=True)
 
     writer = None
     total = 0
-    for chunk in carflow_flat_iter(src, batch_rows=batch_rows):
-        table = pa.Table.from_pandas(chunk, preserve_index=False)
+    for table in _carflow_tables(src, batch_rows, workers):
         if writer is None:
             writer = pq.ParquetWriter(str(out), table.schema, compression="snappy")
-        writer.write_table(table)
-        total += len(chunk)
+        writer.write_table(table.cast(writer.schema))
+        total += len(table)
         print(f"[parquet] rows written: {total:,}", flush=True)
     if writer:
         writer.close()
     print(f"[parquet] done → {out} ({total:,} rows)")
 
 # Writer: CSV.GZ (portable fallback)
-def write_carflow_csv_gz(src: str = CARFLOW_SRC, out_csv_gz: str = OUT_CSV_GZ, batch_rows: int = 500_000):
+def write_carflow_csv_gz(src: str = CARFLOW_SRC, out_csv_gz: str = OUT_CSV_GZ, batch_rows: int = 500_000,
+                         workers: int = 1):
     """
     Stream-flatten src into a gzipped CSV at out_csv_gz.
-    Always available. slower/larger than Parquet but very portable.
+    Always available (parsing with workers > 1 needs pyarrow). slower/larger than Parquet but very portable.
     """
     out = Path(out_csv_gz)
     out.parent.mkdir(parents=True, exist_ok=True)
 
     first = True
     total = 0
-    for chunk in carflow_flat_iter(src, batch_rows=batch_rows):
+    chunks = (carflow_flat_iter(src, batch_rows=batch_rows) if workers <= 1
+              else (table.to_pandas() for table in _carflow_tables(src, batch_rows, workers)))
+    for chunk in chunks:
         chunk.to_csv(out, index=False, mode=("w" if first else "a"),
                      header=first, compression="gzip")
         first = False
@@ -169,15 +264,17 @@ def write_carflow_csv_gz(src: str = CARFLOW_SRC, out_csv_gz: str = OUT_CSV_GZ, b
 def write_carflow_both(src: str = CARFLOW_SRC,
                        out_parquet: str = OUT_PARQUET,
                        out_csv_gz: str = OUT_CSV_GZ,
-                       batch_rows: int = 500_000):
+                       batch_rows: int = 500_000,
+                       workers: int = 1):
     """
     Try to write Parquet first (if pyarrow present), then also write CSV.GZ.
     """
     try:
-        write_carflow_parquet(src=src, out_parquet=out_parquet, batch_rows=batch_rows)
+        write_carflow_parquet(src=src, out_parquet=out_parquet, batch_rows=batch_rows, workers=workers)
     except Exception as e:
         print(f"[parquet] skipped ({e}); continuing with CSV.GZ …", flush=True)
-    write_carflow_csv_gz(src=src, out_csv_gz=out_csv_gz, batch_rows=batch_rows)
+        workers = 1  # the parallel parser needs pyarrow too
+    write_carflow_csv_gz(src=src, out_csv_gz=out_csv_gz, batch_rows=batch_rows, workers=workers)
 
 # ---------- CLI: run this file to build outputs ----------
 if __name__ == "__main__":
@@ -189,11 +286,14 @@ if __name__ == "__main__":
     ap.add_argument("--rows", type=int, default=500_000, help="Batch size for streaming writes.")
     ap.add_argument("--mode", choices=["parquet", "csv", "both"], default="both",
                     help="Which outputs to produce.")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Parser processes; >1 splits the raw file into chunks parsed in parallel (needs pyarrow).")
     args = ap.parse_args()
 
     if args.mode == "parquet":
-        write_carflow_parquet(src=args.src, out_parquet=args.parquet, batch_rows=args.rows)
+        write_carflow_parquet(src=args.src, out_parquet=args.parquet, batch_rows=args.rows, workers=args.workers)
     elif args.mode == "csv":
-        write_carflow_csv_gz(src=args.src, out_csv_gz=args.csvgz, batch_rows=args.rows)
+        write_carflow_csv_gz(src=args.src, out_csv_gz=args.csvgz, batch_rows=args.rows, workers=args.workers)
     else:
-        write_carflow_both(src=args.src, out_parquet=args.parquet, out_csv_gz=args.csvgz, batch_rows=args.rows)
\ No newline at end of file
+        write_carflow_both(src=args.src, out_parquet=args.parquet, out_csv_gz=args.csvgz,
+                           batch_rows=args.rows, workers=args.workers)
\ No newline at end of file
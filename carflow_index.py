@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+
+class CarflowFrames:
+    """
+    Car-flow data pre-aggregated once into a CSR-style index: the mean traffic_level of every
+    (3-minute frame, road segment) pair, sorted by frame, plus an offsets array so that the segments
+    of frame i are the slice offsets[i]:offsets[i + 1]. Looking up a frame is a constant-time slice
+    instead of a boolean filter and groupby over the full table.
+    """
+
+    def __init__(self, df):
+        agg = df.groupby(["frame_time", "id_str"], sort=True)["traffic_level"].mean()
+        frame_codes, segment_codes = agg.index.codes
+        self.frames = pd.DatetimeIndex(agg.index.levels[0])
+        # every segment id that appears in the data, and per row its position in that vocabulary
+        self.segment_ids = agg.index.levels[1].to_numpy(dtype=object)
+        self.segment_codes = np.asarray(segment_codes, dtype=np.int64)
+        self.ids = self.segment_ids[self.segment_codes]
+        self.levels = agg.to_numpy(dtype=np.float32)
+        self.offsets = np.searchsorted(frame_codes, np.arange(len(self.frames) + 1))
+        self.time_min = df["time_local"].min()
+        self.time_max = df["time_local"].max()
+        self.n_rows = len(df)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame(self, i):
+        """(segment ids, segment codes, mean traffic levels) of frame i, as views on the index arrays."""
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return self.ids[start:stop], self.segment_codes[start:stop], self.levels[start:stop]
+
+
+# traffic_level bins (upper bounds) and their RGBA colours, green → red; segments without data are grey
+TRAFFIC_BINS = [0.5, 0.7, 0.85]
+TRAFFIC_COLORS = np.array([[46, 204, 113, 220], [241, 196, 15, 220], [230, 126, 34, 220], [231, 76, 60, 220]], dtype=np.uint8)
+NO_DATA_COLOR = np.array([180, 180, 180, 80], dtype=np.uint8)
+
+
+def normalize_id(val):
+    """Road id as the string used in the car-flow data (numbers without decimals)."""
+    try:
+        return str(int(val)) if isinstance(val, (int, float)) else str(val)
+    except Exception:
+        return str(val)
+
+def traffic_colors(levels):
+    """RGBA colour per traffic level, for a whole array at once."""
+    # compared in float64 like the `tl < 0.5 / 0.7 / 0.85` checks: a stored float32 0.7 (0.69999999) stays yellow
+    levels = np.asarray(levels, dtype=np.float64)
+    colors = TRAFFIC_COLORS[np.searchsorted(np.asarray(TRAFFIC_BINS, dtype=np.float64), levels, side="right")]
+    colors[np.isnan(levels)] = NO_DATA_COLOR
+    return colors
+
+
+class RoadJoin:
+    """
+    One-time join between the road features (rows of a RoadGeometry attribute table) and the car-flow segment ids.
+    Remembers the property that holds the segment id and, for every feature, the position of its id in the
+    CarflowFrames segment vocabulary (-1 if the segment never has data), so a frame only needs array indexing.
+    """
+
+    def __init__(self, properties, segment_ids, id_field):
+        self.id_field = id_field
+        code_of = {segment_id: code for code, segment_id in enumerate(segment_ids)}
+        raw_ids = properties[id_field] if id_field in properties else pd.Series(None, index=properties.index)
+        self.feature_ids = np.array([None if pd.isna(raw) else normalize_id(raw) for raw in raw_ids], dtype=object)
+        self.feature_codes = np.array([code_of.get(fid, -1) for fid in self.feature_ids], dtype=np.int64)
+        self.n_segments = len(segment_ids)
+
+    def frame_levels(self, codes, levels):
+        """Traffic level of every feature for one frame (NaN where the segment has no data in it)."""
+        by_code = np.full(self.n_segments + 1, np.nan, dtype=np.float32)  # last slot answers code -1
+        by_code[codes] = levels
+        return by_code[self.feature_codes]
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import pandas as pd
+
+# Where the binary copies of the CSV inputs are kept (env override allowed)
+CACHE_DIR = Path(os.getenv("COLUMNAR_CACHE_DIR", "data/.cache"))
+
+
+def _digest(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+def _cache_file(path: str, read_kwargs: dict) -> Path:
+    """
+    Cache file name for a source CSV: <name>.<read options>.<mtime/size>.feather
+    Raises FileNotFoundError (like pd.read_csv) when the source does not exist.
+    """
+    stat = os.stat(path)
+    options_key = _digest([os.path.abspath(path), read_kwargs])
+    source_key = _digest([stat.st_mtime_ns, stat.st_size])
+    return CACHE_DIR / f"{Path(path).name}.{options_key}.{source_key}.feather"
+
+
+def read_csv_cached(path, **read_kwargs) -> pd.DataFrame:
+    """
+    Drop-in replacement for pd.read_csv(path, **read_kwargs).
+    The first read parses the CSV and stores the typed result as an uncompressed Feather file,
+    keyed by the source's mtime and size; later reads memory-map that file instead of parsing text.
+    Falls back to plain pd.read_csv when pyarrow is missing or the cache cannot be used.
+    """
+    try:
+        import pyarrow as pa  # import here so module doesn't hard-depend on pyarrow
+        import pyarrow.feather as feather
+    except ImportError:
+        return pd.read_csv(path, **read_kwargs)
+
+    path = str(path)
+    cache_file = _cache_file(path, read_kwargs)
+    if cache_file.exists():
+        try:
+            return feather.read_table(str(cache_file), memory_map=True).to_pandas()
+        except Exception:
+            pass  # unreadable cache file: parse the CSV again and rewrite it
+
+    df = pd.read_csv(path, **read_kwargs)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # copies made for an older version of the same source are stale now
+        options_key = cache_file.name.rsplit(".", 2)[0]
+        for stale in cache_file.parent.glob(f"{options_key}.*.feather"):
+            if stale != cache_file:
+                stale.unlink(missing_ok=True)
+        # write next to the target and rename, so other processes never read a half-written file
+        tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        feather.write_feather(pa.Table.from_pandas(df), str(tmp), compression="uncompressed")
+        os.replace(tmp, cache_file)
+    except Exception as e:
+        print(f"[columnar cache] not written for {path} ({e})", flush=True)
+    return df
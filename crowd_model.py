@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from forecast_cache import model_fingerprint
+
+# Pickled XGBRegressor produced by Notebooks/XGB_Model_Training.ipynb
+MODEL_PKL = "Notebooks/crowd_count_model.pkl"
+
+
+class CrowdModel:
+    """
+    Crowd count model loaded from XGBoost's native format.
+    predict() accepts the model input as a DataFrame or as a NumPy array in feature_names order
+    and goes straight to the booster, skipping the sklearn wrapper and its pandas checks.
+    """
+
+    def __init__(self, booster, feature_names, fingerprint):
+        self.booster = booster
+        self.feature_names = list(feature_names)
+        self.fingerprint = fingerprint
+
+    def predict(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_names].to_numpy(dtype=np.float32)
+        else:
+            X = np.asarray(X, dtype=np.float32)
+        # columns were checked against the stored schema when loading, so per-call validation is skipped
+        return self.booster.inplace_predict(X, validate_features=False)
+
+
+def native_paths(model_path):
+    """Paths of the native model file (.ubj) and its feature schema (.schema.json) next to model_path."""
+    model_path = Path(model_path)
+    return model_path.with_suffix(".ubj"), model_path.with_suffix(".schema.json")
+
+
+def save_native_model(booster, model_path):
+    """Writes booster in XGBoost's native UBJ format plus a JSON schema with the feature names and types."""
+    native_path, schema_path = native_paths(model_path)
+    booster.save_model(str(native_path))
+    schema = {"feature_names": booster.feature_names, "feature_types": booster.feature_types}
+    schema_path.write_text(json.dumps(schema, indent=2))
+    return native_path, schema_path
+
+
+def load_crowd_model(model_path=MODEL_PKL, expected_features=None):
+    """
+    Loads the crowd count model from its native format (the .ubj and .schema.json next to model_path).
+    Read-only: the native files come from train_crowd_model.py, or from running this module for an existing pickle.
+    Raises ValueError if the booster or expected_features do not match the stored feature schema.
+    """
+    import xgboost as xgb  # import here so module doesn't hard-depend on xgboost
+
+    native_path, schema_path = native_paths(model_path)
+    if not native_path.exists() or not schema_path.exists():
+        raise FileNotFoundError(
+            f"Native model {native_path} or schema {schema_path} not found; export it with: python crowd_model.py --model {model_path}"
+        )
+
+    booster = xgb.Booster()
+    booster.load_model(str(native_path))
+    feature_names = json.loads(schema_path.read_text())["feature_names"]
+    if booster.feature_names is not None and list(booster.feature_names) != feature_names:
+        raise ValueError(f"{native_path} does not match its schema {schema_path}")
+    if expected_features is not None and list(expected_features) != feature_names:
+        raise ValueError(
+            f"Model expects features {feature_names}, but the feature builder produces {list(expected_features)}"
+        )
+    return CrowdModel(booster, feature_names, model_fingerprint(str(native_path)))
+
+
+def export_native_model(model_path=MODEL_PKL):
+    """Exports the native model file and schema from a pickled XGBRegressor."""
+    import joblib
+    return save_native_model(joblib.load(model_path).get_booster(), model_path)
+
+
+# ---------- CLI: export the native model of a pickled model ----------
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Export a pickled XGBRegressor to XGBoost's native format + schema.")
+    ap.add_argument("--model", default=MODEL_PKL, help="Pickled model; the .ubj and .schema.json are written next to it.")
+    args = ap.parse_args()
+
+    native_path, schema_path = export_native_model(args.model)
+    print(f"[model] exported {native_path} and {schema_path}")
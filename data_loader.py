@@ -1,16 +1,19 @@
 import streamlit as st
-import pandas as pd
 import geopandas as gpd
+from sensor_store import SensorStore
+from sensor_geometry import SensorGeometry
+from columnar_cache import read_csv_cached
+from replay import get_replay_clock
 
-@st.cache_data
+# Immutable, so one validated copy is shared by every session
+@st.cache_resource
 def load_sensor_locations():
     """
-    Loads and caches the static sensor location data from your file.
+    Loads the static sensor location data from your file once into a validated SensorGeometry table.
     """
     try:
-        sensor_loc = pd.read_csv("data/sensor_location_cleaned.csv")
-        sensor_loc[['Lat', 'Lon']] = sensor_loc['Lat/Long'].str.split(',', expand=True).astype(float)
-        return sensor_loc
+        sensor_loc = read_csv_cached("data/sensor_location_cleaned.csv")
+        return SensorGeometry(sensor_loc)
     except FileNotFoundError:
         st.error("Error: The file 'data/sensor_location_cleaned.csv' was not found.")
         st.stop()
@@ -28,43 +31,67 @@ def load_tram_metro_data():
         st.warning(f"Could not load tram/metro data. Error: {e}")
         return gpd.GeoDataFrame()
 
-def init_data_stream():
+# One process-wide copy of the merged data, shared by every session instead of one copy per browser tab
+@st.cache_resource
+def load_sensor_store():
     """
-    Initializes the live data feed by loading the full dataset.
+    Loads the full merged dataset once into a read-only, timestamp-indexed SensorStore.
     """
-    if 'full_sensor_data' not in st.session_state:
-        try:
-            df = pd.read_csv('data/crowd_weather_merged.csv', 
+    try:
+        df = read_csv_cached('data/crowd_weather_merged.csv', 
                              index_col='timestamp', 
                              parse_dates=True)
-            st.session_state.full_sensor_data = df
-            st.session_state.data_index = 0
-            print("Data stream initialized.")
-        except FileNotFoundError:
-            st.error("Error: The main data file 'data/crowd_weather_merged.csv' was not found.")
-            st.stop()
+    except FileNotFoundError:
+        st.error("Error: The main data file 'data/crowd_weather_merged.csv' was not found.")
+        st.stop()
+    return SensorStore(df)
+
+def init_data_stream():
+    """
+    Initializes the live data feed: the data lives in the shared store and the position in the shared replay clock.
+    """
+    if 'data_stream' not in st.session_state:
+        get_replay_clock()
+        st.session_state.data_stream = True
+        print("Data stream initialized.")
 
 # Load sensor locations
 
 @st.cache_data
 def load_sensor_data():
 
-    sensor_data = pd.read_csv("data/sensor_data.csv")
+    sensor_data = read_csv_cached("data/sensor_data.csv")
 
     return sensor_data
 
 
+# Live feed from the adapter chosen with SENSOR_INGEST (see ingest.py), started once per process
+@st.cache_resource
+def get_live_ingest():
+    """
+    Returns the (RingBuffer, adapter) pair filled by the live ingest adapter, or None when SENSOR_INGEST is not set
+    and the dashboard replays the stored data instead.
+    """
+    from ingest import INGEST_KIND, start_ingest  # import here so the replay mode doesn't load the ingest code
+    if not INGEST_KIND:
+        return None
+    return start_ingest(load_sensor_store().columns)
+
 def load_live_sensor_data():
-    if 'full_sensor_data' not in st.session_state:
+    if 'data_stream' not in st.session_state:
         init_data_stream()
 
-    df = st.session_state.full_sensor_data
-    index = st.session_state.data_index
+    # newest row of the live feed, if one is configured and has delivered data
+    ingest = get_live_ingest()
+    if ingest is not None:
+        sensor_data_dict, current_timestamp = ingest[0].latest()
+        if sensor_data_dict is not None:
+            return sensor_data_dict, current_timestamp
 
-    current_data_row = df.iloc[index]
-    current_timestamp = df.index[index]
+    # every page reads the row the shared replay clock is on, so they all show the same instant
+    store = load_sensor_store()
+    position, _ = get_replay_clock().current()
 
-    sensor_data_dict = {col: [val] for col, val in current_data_row.items()}
-    st.session_state.data_index = (st.session_state.data_index + 1) % len(df)
+    sensor_data_dict, current_timestamp = store.row(position)
 
     return sensor_data_dict, current_timestamp
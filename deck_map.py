@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+from map_utils import COUNT_CIRCLE_BINS, FLOW_CIRCLE_BINS, COUNT_ARROW_BINS, FLOW_ARROW_BINS, color_bins
+
+# pydeck equivalents of the folium tile styles; None is the default OSM-like basemap the other pydeck pages use
+MAP_STYLES = {
+    "OpenStreetMap": None,
+    "CartoDB Positron": pdk.map_styles.CARTO_LIGHT,
+    "CartoDB Dark_Matter": pdk.map_styles.CARTO_DARK,
+}
+
+# One tooltip for every pickable layer: each layer fills `details` with its own labelled fields
+TOOLTIP = {"html": "<b>{name}</b><br/>{details}"}
+
+
+def _rgba(hex_colors, alpha):
+    """(n, 4) uint8 array from an array of '#RRGGBB' strings."""
+    rgb = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in hex_colors], dtype=np.uint8).reshape(-1, 3)
+    return np.column_stack([rgb, np.full(len(rgb), alpha, dtype=np.uint8)])
+
+def sensor_frame(geometry, sensor_data, default, keep=None):
+    """
+    One row per drawable sensor with position, value, name and object id, taken straight from the geometry arrays.
+    The colour columns are added by the layer functions.
+    """
+    values = geometry.values_for(sensor_data, default=default)
+    keep = geometry.valid if keep is None else keep
+    df = pd.DataFrame({
+        "lon": geometry.lon[keep],
+        "lat": geometry.lat[keep],
+        "intensity": values[keep],
+        "direction": geometry.direction[keep],
+        "name": geometry.names[keep],
+        "object": geometry.objects[keep],
+    })
+    df["details"] = "Objectummer: " + df["object"] + "<br/>Intensity: " + df["intensity"].map("{:g}".format)
+    return df
+
+def circle_layer(geometry, sensor_data, flow=False):
+    bins, scale = (FLOW_CIRCLE_BINS, 1) if flow else (COUNT_CIRCLE_BINS, 0.2)
+    df = sensor_frame(geometry, sensor_data, np.nan)
+    df = df[df["intensity"].notna()].copy()  # sensors without a value are not drawn
+    df["color"] = _rgba(color_bins(df["intensity"].to_numpy(), bins), 150).tolist()
+    df["radius"] = 2 + df["intensity"] * scale # same pixel radius as the folium circles
+    return pdk.Layer(
+        "ScatterplotLayer",
+        data=df,
+        get_position=["lon", "lat"],
+        get_radius="radius",
+        radius_units="pixels",
+        get_fill_color="color",
+        get_line_color="color",
+        stroked=True,
+        pickable=True,
+    )
+
+def arrow_layer(geometry, sensor_data, flow=False):
+    bins = FLOW_ARROW_BINS if flow else COUNT_ARROW_BINS
+    df = sensor_frame(geometry, sensor_data, 0, keep=geometry.valid_direction)
+    df["color"] = _rgba(color_bins(df["intensity"].to_numpy(), bins), 255).tolist()
+    # deck.gl rotates counter-clockwise, the sensor direction (like the CSS rotate of the folium arrows) is clockwise
+    df["angle"] = -df["direction"]
+    df["arrow"] = "→"
+    return pdk.Layer(
+        "TextLayer",
+        data=df,
+        get_position=["lon", "lat"],
+        get_text="arrow",
+        get_angle="angle",
+        get_color="color",
+        get_size=24,
+        font_weight="bold",
+        character_set=["→"],
+        pickable=True,
+    )
+
+def heatmap_layer(geometry, sensor_data):
+    df = sensor_frame(geometry, sensor_data, 0)
+    df = df[df["intensity"] > 0]
+    return pdk.Layer(
+        "HeatmapLayer",
+        data=df[["lon", "lat", "intensity"]],
+        get_position=["lon", "lat"],
+        get_weight="intensity",
+        radius_pixels=30,
+    )
+
+def heatmap_bitmap_layer(geometry, sensor_data, cache_key):
+    """Server-side rendered heatmap (see heatmap_raster) as a single image."""
+    from heatmap_raster import heatmap_image
+    image_url, ((south, west), (north, east)) = heatmap_image(cache_key, geometry, geometry.values_for(sensor_data, default=0))
+    return pdk.Layer("BitmapLayer", image=image_url, bounds=[west, south, east, north])
+
+def label_layer(geometry):
+    df = sensor_frame(geometry, {}, np.nan)
+    return pdk.Layer(
+        "TextLayer",
+        data=df[["lon", "lat", "object"]],
+        get_position=["lon", "lat"],
+        get_text="object",
+        get_size=12,
+        get_color=[255, 255, 255],
+        background=True,
+        get_background_color=[0, 0, 0, 204],
+        background_padding=[6, 3],
+        get_pixel_offset=[0, -18],
+    )
+
+def marker_layer(geometry):
+    df = sensor_frame(geometry, {}, np.nan)
+    return pdk.Layer(
+        "ScatterplotLayer",
+        data=df,
+        get_position=["lon", "lat"],
+        get_radius=6,
+        radius_units="pixels",
+        get_fill_color=[220, 20, 60, 220],
+        pickable=True,
+    )
+
+def stops_layer(tram_metro_gdf):
+    if tram_metro_gdf.empty:
+        return None
+    # the lat/lng GeoJSON of the city stores Point(lat, lon), see add_stops_circles
+    df = pd.DataFrame({
+        "lon": tram_metro_gdf.geometry.y.to_numpy(),
+        "lat": tram_metro_gdf.geometry.x.to_numpy(),
+        "name": tram_metro_gdf["Naam"].astype(str).to_numpy(),
+        "type": tram_metro_gdf["Modaliteit"].astype(str).to_numpy(),
+        "lines": tram_metro_gdf["Lijn"].astype(str).to_numpy(),
+    })
+    df["details"] = "Type: " + df["type"] + "<br/>Lijnen: " + df["lines"]
+    df["color"] = np.where(df["type"] == "Tram", "#0000FF", "#FF0000")
+    df["color"] = _rgba(df["color"].to_numpy(), 204).tolist()
+    return pdk.Layer(
+        "ScatterplotLayer",
+        data=df,
+        get_position=["lon", "lat"],
+        get_radius=5,
+        radius_units="pixels",
+        get_fill_color="color",
+        pickable=True,
+    )
+
+
+def build_deck(geometry, sensor_data, map_style, center, zoom, flow=False, show_sensor_data=True,
+               show_sensor_arrows=True, show_heatmap=True, show_sensor_loc=False, show_sensor_labels=False,
+               tram_metro_gdf=None, heatmap_cache_key=None):
+    """
+    Home map as a pydeck Deck: the same layers as the folium engine, drawn on the GPU in the browser.
+    With a heatmap_cache_key the heatmap is rendered on the server and cached under that key.
+    Returns the deck and the rows skipped because of missing location data.
+    """
+    if isinstance(center, dict):
+        center = [center['lat'], center['lng']]
+
+    layers, skipped_rows = [], set()
+    if show_heatmap:
+        if heatmap_cache_key is not None:
+            layers.append(heatmap_bitmap_layer(geometry, sensor_data, heatmap_cache_key))
+        else:
+            layers.append(heatmap_layer(geometry, sensor_data))
+        skipped_rows.update(geometry.missing_rows)
+    if show_sensor_data:
+        layers.append(circle_layer(geometry, sensor_data, flow))
+        skipped_rows.update(geometry.missing_rows)
+    if show_sensor_loc:
+        layers.append(marker_layer(geometry))
+        skipped_rows.update(geometry.missing_rows)
+    if tram_metro_gdf is not None:
+        layer = stops_layer(tram_metro_gdf)
+        if layer is not None:
+            layers.append(layer)
+    if show_sensor_arrows:
+        layers.append(arrow_layer(geometry, sensor_data, flow))
+        skipped_rows.update(geometry.missing_direction_rows)
+    if show_sensor_labels:
+        layers.append(label_layer(geometry))
+        skipped_rows.update(geometry.missing_rows)
+
+    deck = pdk.Deck(
+        map_style=MAP_STYLES.get(map_style),
+        initial_view_state=pdk.ViewState(latitude=center[0], longitude=center[1], zoom=zoom),
+        layers=layers,
+        tooltip=TOOLTIP,
+    )
+    return deck, skipped_rows
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+# Lags and rolling windows the crowd count model was trained with (see Notebooks/XGB_Model_Training.ipynb)
+LAGS = [1, 2, 3, 5, 10, 20, 30, 40, 50, 60, 75]
+ROLLING_WINDOWS = [3, 5, 10, 20, 40, 60]
+
+
+def create_features(df, sensor_cols, feature_cols,
+                    lags=LAGS,
+                    rolling_windows=ROLLING_WINDOWS,
+                    dropna=True):
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = df.set_index('timestamp')
+    df_long = df[sensor_cols].reset_index().melt(
+        id_vars='timestamp',
+        value_vars=sensor_cols,
+        var_name='location',
+        value_name='count'
+    )
+    df_long = df_long.merge(df[feature_cols].reset_index(), on='timestamp', how='left')
+    loc_map = {loc: i for i, loc in enumerate(sensor_cols)}
+    df_long['location_id'] = df_long['location'].map(loc_map)
+    df_long = df_long.sort_values(['location_id', 'timestamp'])
+    for lag in lags:
+        df_long[f'lag_{lag}'] = df_long.groupby('location_id')['count'].shift(lag)
+    for w in rolling_windows:
+        df_long[f'roll_mean_{w}'] = df_long.groupby('location_id')['count'].rolling(w).mean().reset_index(level=0, drop=True)
+    if dropna:
+        df_long = df_long.dropna()
+    return df_long
+
+
+class IncrementalFeatureBuilder:
+    """
+    Stateful version of create_features for a stream that grows one timestamp at a time.
+    Keeps a ring buffer with the last counts of every sensor plus running sums for the rolling means,
+    so each new timestamp produces one feature row per sensor in O(sensors) instead of rebuilding the whole history.
+    The rows have exactly the columns of create_features, so the trained model can be used unchanged.
+    """
+
+    def __init__(self, sensor_cols, feature_cols, lags=LAGS, rolling_windows=ROLLING_WINDOWS):
+        self.sensor_cols = list(sensor_cols)
+        self.feature_cols = list(feature_cols)
+        self.lags = list(lags)
+        self.rolling_windows = list(rolling_windows)
+        # model input columns, in the order create_features produces them
+        self.model_cols = (self.feature_cols + ['location_id']
+                           + [f'lag_{lag}' for lag in self.lags]
+                           + [f'roll_mean_{w}' for w in self.rolling_windows])
+
+        n_sensors = len(self.sensor_cols)
+        # room for the current count plus the oldest one any lag or window needs
+        self.capacity = max(self.lags + self.rolling_windows) + 1
+        self.counts = np.full((self.capacity, n_sensors), np.nan)
+        # running sums per window (missing counts excluded) and the number of missing counts inside each window
+        self.sums = np.zeros((len(self.rolling_windows), n_sensors))
+        self.missing = np.zeros((len(self.rolling_windows), n_sensors), dtype=int)
+        self.location_ids = np.arange(n_sensors)
+        self.n_seen = 0
+        self.timestamp = None
+        self.features = np.full(len(self.feature_cols), np.nan)
+        # dtypes of the feature and count columns in the source frame (set by from_history); values are kept as floats
+        self.dtypes = {}
+
+    @classmethod
+    def from_history(cls, history, sensor_cols, feature_cols, **kwargs):
+        """
+        Builds a builder whose newest timestamp is the last row of history (wide frame indexed by timestamp).
+        Only the last `capacity` rows can influence the features, so only those are replayed.
+        """
+        builder = cls(sensor_cols, feature_cols, **kwargs)
+        # melt() gives the count column the common dtype of the sensor columns, like create_features
+        builder.dtypes = {**history[builder.feature_cols].dtypes.to_dict(),
+                          'count': np.result_type(*history[builder.sensor_cols].dtypes)}
+        tail = history.iloc[-builder.capacity:]
+        counts = tail[builder.sensor_cols].to_numpy(dtype=float)
+        features = tail[builder.feature_cols].to_numpy(dtype=float)
+        for timestamp, row_counts, row_features in zip(tail.index, counts, features):
+            builder.push(timestamp, row_counts, row_features)
+        return builder
+
+    def copy(self):
+        """Independent copy, e.g. to run a forecast without touching the live state."""
+        other = object.__new__(type(self))
+        other.__dict__.update(self.__dict__)
+        for name in ("counts", "sums", "missing", "features"):
+            setattr(other, name, getattr(self, name).copy())
+        return other
+
+    def push(self, timestamp, counts, features):
+        """Adds the counts of all sensors (in sensor_cols order) and the feature values for a new timestamp."""
+        counts = np.asarray(counts, dtype=float)
+        t = self.n_seen
+        new_missing = np.isnan(counts)
+        new_values = np.where(new_missing, 0.0, counts)
+        for k, w in enumerate(self.rolling_windows):
+            # the count from w steps ago drops out of the window
+            if t >= w:
+                old = self.counts[(t - w) % self.capacity]
+                old_missing = np.isnan(old)
+                self.sums[k] -= np.where(old_missing, 0.0, old)
+                self.missing[k] -= old_missing
+            self.sums[k] += new_values
+            self.missing[k] += new_missing
+        self.counts[t % self.capacity] = counts
+        self.features = np.asarray(features, dtype=float)
+        self.timestamp = timestamp
+        self.n_seen = t + 1
+
+    def matrix(self):
+        """Model input for the newest timestamp as a (sensors x model_cols) array."""
+        t = self.n_seen - 1
+        n_sensors = len(self.sensor_cols)
+        # slots that were never written are still NaN, which matches shift() at the start of the history
+        lag_values = [self.counts[(t - lag) % self.capacity] for lag in self.lags]
+        roll_values = []
+        for k, w in enumerate(self.rolling_windows):
+            mean = self.sums[k] / w
+            # rolling(w).mean() is NaN until w counts exist and whenever the window holds a missing count
+            roll_values.append(np.where((self.n_seen >= w) & (self.missing[k] == 0), mean, np.nan))
+        return np.column_stack([np.tile(self.features, (n_sensors, 1)), self.location_ids]
+                               + lag_values + roll_values)
+
+    def model_input(self):
+        """Model input for the newest timestamp as a DataFrame with the training column names."""
+        X = pd.DataFrame(self.matrix(), columns=self.model_cols)
+        X['location_id'] = self.location_ids
+        return X.astype({col: dtype for col, dtype in self.dtypes.items() if col in self.feature_cols})
+
+    def latest_rows(self):
+        """Feature rows for the newest timestamp, with the same columns as create_features(..., dropna=False)."""
+        rows = self.model_input()
+        rows.insert(0, 'timestamp', self.timestamp)
+        rows.insert(1, 'location', self.sensor_cols)
+        rows.insert(2, 'count', self.counts[(self.n_seen - 1) % self.capacity])
+        if 'count' in self.dtypes:
+            rows['count'] = rows['count'].astype(self.dtypes['count'])
+        return rows
+
+
+def advance_builder(builder, history, sensor_cols, feature_cols, timestamp):
+    """
+    Returns a builder whose newest timestamp is `timestamp` (a row of the wide history frame).
+    If the builder is exactly one row behind this is a single push, otherwise (first use, seek, wrap-around)
+    it is rebuilt from the rows up to the timestamp.
+    """
+    if builder is not None and builder.timestamp == timestamp:
+        return builder
+    position = history.index.get_loc(timestamp)
+    if builder is None or position == 0 or builder.timestamp != history.index[position - 1]:
+        return IncrementalFeatureBuilder.from_history(history.iloc[:position + 1], sensor_cols, feature_cols)
+    builder.push(timestamp, history[builder.sensor_cols].values[position], history[builder.feature_cols].values[position])
+    return builder
@@ -0,0 +1,79 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+
+def model_fingerprint(path: str) -> str:
+    """Short content hash of a model file, so cached forecasts are never served for a different model."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class ForecastCache:
+    """
+    Thread-safe LRU cache for forecasts, keyed by (data timestamp, sensor, horizon, model fingerprint).
+    One instance is shared by all sessions. It is bounded both by the number of entries and by their memory;
+    the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries=5000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, size in bytes)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _size(value) -> int:
+        if isinstance(value, (pd.Series, pd.DataFrame)):
+            return int(pd.Series(value.memory_usage(index=True, deep=True)).sum())
+        return sys.getsizeof(value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._size(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            # evict least recently used entries, but always keep the one just added
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+
+    def peek_forecasts(self, timestamp, sensors, horizon, fingerprint):
+        """Returns the cached forecasts of the requested sensors as a DataFrame, or None if any of them is missing."""
+        cached = []
+        for sensor in sensors:
+            value = self.get((timestamp, sensor, horizon, fingerprint))
+            if value is None:
+                return None
+            cached.append(value)
+        return pd.concat(cached, axis=1, keys=list(sensors))
+
+    def publish(self, timestamp, horizon, fingerprint, forecast):
+        """Stores a forecast for all sensors (one column per sensor) under their own keys."""
+        for sensor in forecast.columns:
+            self.put((timestamp, sensor, horizon, fingerprint), forecast[sensor])
+
@@ -0,0 +1,68 @@
+import queue
+import threading
+import traceback
+from feature_builder import advance_builder
+from forecasting import recursive_forecast_all
+
+
+class ForecastWorker:
+    """
+    Background thread that runs the crowd forecasts outside of the Streamlit script runs.
+    Pages call request(timestamp) when the live stream advances and read results with result(timestamp);
+    the worker computes the forecasts of all sensors and publishes them to the shared ForecastCache.
+    It also precomputes the next `lookahead` timestamps, so the forecast is usually ready before a page asks for it.
+    """
+
+    def __init__(self, model, fingerprint, history, sensor_cols, feature_cols, cache,
+                 steps=20, interval_minutes=3, lookahead=2):
+        self.model = model
+        self.fingerprint = fingerprint
+        self.history = history
+        self.sensor_cols = list(sensor_cols)
+        self.feature_cols = list(feature_cols)
+        self.cache = cache
+        self.steps = steps
+        self.interval_minutes = interval_minutes
+        self.lookahead = lookahead
+        self._builder = None  # only touched by the worker thread
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="forecast-worker", daemon=True)
+        self._thread.start()
+
+    def result(self, timestamp):
+        """Forecasts of all sensors for this timestamp (DataFrame, one column per sensor), or None if not ready yet."""
+        return self.cache.peek_forecasts(timestamp, self.sensor_cols, self.steps, self.fingerprint)
+
+    def request(self, timestamp):
+        """
+        Asks the worker to compute the forecasts for this timestamp (no-op if they are already published).
+        Raises ValueError for a timestamp outside the history, which the worker could never forecast.
+        """
+        if timestamp not in self.history.index:
+            raise ValueError(f"No stored history for {timestamp}; forecasts need the weather and time features of the stored data")
+        if self.result(timestamp) is None:
+            self._requests.put(timestamp)
+
+    def _run(self):
+        while True:
+            timestamp = self._requests.get()
+            # only the newest request matters, older ones were for frames the pages have already left
+            while not self._requests.empty():
+                timestamp = self._requests.get_nowait()
+            try:
+                self._forecast_from(timestamp)
+            except Exception:
+                print(f"[forecast worker] failed for {timestamp}:\n{traceback.format_exc()}", flush=True)
+
+    def _forecast_from(self, timestamp):
+        position = self.history.index.get_loc(timestamp)
+        for ahead in range(self.lookahead + 1):
+            # a newer request interrupts the precomputation of frames further ahead
+            if ahead > 0 and not self._requests.empty():
+                return
+            ts = self.history.index[(position + ahead) % len(self.history)]
+            self._builder = advance_builder(self._builder, self.history, self.sensor_cols, self.feature_cols, ts)
+            if self.result(ts) is None:
+                forecast = recursive_forecast_all(self.model, self._builder, steps=self.steps,
+                                                  interval_minutes=self.interval_minutes)
+                self.cache.publish(ts, self.steps, self.fingerprint, forecast)
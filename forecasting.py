@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+
+def recursive_forecast_all(model, builder, steps=20, interval_minutes=3):
+    """
+    Recursive multi-step forecast for all sensors at once, starting from the newest timestamp of builder.
+    Every step is a single model.predict over the (sensors x features) matrix; the predictions are then
+    pushed into a copy of the builder as the counts of the next timestamp, so lags and rolling means update in place.
+    Weather and time features are held at their last known values.
+    Returns a DataFrame indexed by the forecast timestamps with one column per sensor.
+    """
+    state = builder.copy()
+    timestamps, predictions = [], []
+    for step in range(1, steps + 1):
+        ts = builder.timestamp + pd.Timedelta(minutes=interval_minutes * step)
+        pred = np.asarray(model.predict(state.model_input()), dtype=float)
+        timestamps.append(ts)
+        predictions.append(pred)
+        state.push(ts, pred, state.features)
+    return pd.DataFrame(np.vstack(predictions),
+                        index=pd.DatetimeIndex(timestamps, name="timestamp"),
+                        columns=state.sensor_cols)
@@ -0,0 +1,75 @@
+import numpy as np
+import streamlit as st
+from folium.utilities import image_to_url
+
+# Lattice and kernel of the server-side heatmap
+GRID_SIZE = 256       # cells along each axis
+BANDWIDTH_M = 120     # standard deviation of the Gaussian kernel in metres
+MARGIN_M = 400        # extra space around the outermost sensors
+METRES_PER_DEGREE = 111_320
+
+# Same colour ramp as the Leaflet.heat plugin behind folium's HeatMap
+GRADIENT_STOPS = [0.0, 0.4, 0.6, 0.7, 0.8, 1.0]
+GRADIENT_RGB = np.array([
+    [0, 0, 255], [0, 0, 255], [0, 255, 255], [0, 255, 0], [255, 255, 0], [255, 0, 0]
+], dtype=float)
+
+
+class HeatmapGrid:
+    """
+    Kernel density of the sensor values on a fixed lat/lon lattice over the event area.
+    The Gaussian weight of every sensor on every cell is computed once, so a frame is a single
+    matrix-vector product (density = weights @ values) whose cost does not depend on the client.
+    """
+
+    def __init__(self, geometry, grid_size=GRID_SIZE, bandwidth_m=BANDWIDTH_M, margin_m=MARGIN_M):
+        self.sensors = np.flatnonzero(geometry.valid)
+        lat = geometry.lat[self.sensors]
+        lon = geometry.lon[self.sensors]
+        # metres per degree of longitude shrink with the latitude of the area
+        lon_scale = METRES_PER_DEGREE * np.cos(np.radians(lat.mean()))
+        margin_lat = margin_m / METRES_PER_DEGREE
+        margin_lon = margin_m / lon_scale
+        self.south, self.north = lat.min() - margin_lat, lat.max() + margin_lat
+        self.west, self.east = lon.min() - margin_lon, lon.max() + margin_lon
+        self.shape = (grid_size, grid_size)
+
+        # cell centres, first row is the northern edge (image origin is upper left)
+        cell_lat = np.linspace(self.north, self.south, grid_size)
+        cell_lon = np.linspace(self.west, self.east, grid_size)
+        dy = (cell_lat[:, None] - lat[None, :]) * METRES_PER_DEGREE      # (rows, sensors)
+        dx = (cell_lon[:, None] - lon[None, :]) * lon_scale              # (cols, sensors)
+        wy = np.exp(-0.5 * (dy / bandwidth_m) ** 2)
+        wx = np.exp(-0.5 * (dx / bandwidth_m) ** 2)
+        # the 2D Gaussian is separable: weight(cell, sensor) = wy(row, sensor) * wx(col, sensor)
+        self.weights = (wy[:, None, :] * wx[None, :, :]).reshape(-1, len(self.sensors)).astype(np.float32)
+
+    @property
+    def bounds(self):
+        return [[self.south, self.west], [self.north, self.east]]
+
+    def density(self, values):
+        """Density grid for the values of all sensors (in geometry order); missing values count as 0."""
+        values = np.nan_to_num(np.asarray(values, dtype=np.float32)[self.sensors])
+        return (self.weights @ np.clip(values, 0, None)).reshape(self.shape)
+
+    def rgba(self, density):
+        """Colours a density grid, scaled to its own maximum; cells without density are transparent."""
+        peak = density.max()
+        norm = density / peak if peak > 0 else np.zeros_like(density)
+        rgb = np.stack([np.interp(norm, GRADIENT_STOPS, GRADIENT_RGB[:, c]) for c in range(3)], axis=-1)
+        alpha = np.clip(norm / GRADIENT_STOPS[1], 0, 1) * 200
+        return np.dstack([rgb, alpha]).astype(np.uint8)
+
+
+@st.cache_resource(show_spinner=False)
+def get_heatmap_grid(_geometry, grid_size=GRID_SIZE, bandwidth_m=BANDWIDTH_M, margin_m=MARGIN_M):
+    """The precomputed weights, shared by every session."""
+    return HeatmapGrid(_geometry, grid_size, bandwidth_m, margin_m)
+
+# Keyed by (timestamp, dataset) only; the values are fully determined by that key
+@st.cache_data(max_entries=512, show_spinner=False)
+def heatmap_image(cache_key, _geometry, _values):
+    """PNG data URL and bounds of the heatmap for one frame."""
+    grid = get_heatmap_grid(_geometry)
+    return image_to_url(grid.rgba(grid.density(_values))), grid.bounds
@@ -0,0 +1,246 @@
+# ingest.py
+# --- Live sensor ingest: adapters that push new readings into a shared in-memory RingBuffer.
+#     Choose one with the SENSOR_INGEST environment variable (simulator, file or http). ---
+
+import io
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+from columnar_cache import read_csv_cached
+from ring_buffer import RingBuffer
+
+#  Defaults (overridable with environment variables)
+DATA_FILE      = os.getenv("CROWD_DATA", "data/crowd_weather_merged.csv")
+INGEST_KIND    = os.getenv("SENSOR_INGEST", "")               # "" keeps the replay of the stored data
+SIM_RATE       = float(os.getenv("SENSOR_SIM_RATE", "0.2"))   # rows per second (one row = every sensor once)
+TAIL_FILE      = os.getenv("SENSOR_TAIL_FILE", "data/live_sensor_feed.csv")
+HTTP_HOST      = os.getenv("SENSOR_HTTP_HOST", "127.0.0.1")
+HTTP_PORT      = int(os.getenv("SENSOR_HTTP_PORT", "8765"))
+BUFFER_ROWS    = int(os.getenv("SENSOR_BUFFER_ROWS", str(7 * 24 * 20)))  # one week of 3-minute rows
+LOCAL_TZ       = "Europe/Amsterdam"                           # the stored data is in Amsterdam local time
+
+
+def _naive(timestamps):
+    """Timestamps as naive local (Amsterdam) datetime64 values, like the index of the stored data."""
+    try:
+        timestamps = pd.to_datetime(pd.Index(timestamps))
+    except ValueError:
+        # mixed UTC offsets (e.g. a batch across a DST change) only parse as UTC
+        timestamps = pd.to_datetime(pd.Index(timestamps), utc=True)
+    if timestamps.tz is not None:
+        # e.g. UTC readings: convert to local time first, dropping the zone alone would keep the UTC wall time
+        timestamps = timestamps.tz_convert(LOCAL_TZ).tz_localize(None)
+    return timestamps.to_numpy(dtype="datetime64[ns]")
+
+def _frame_to_rows(frame, columns):
+    """Aligns a wide frame (timestamp column + any subset of columns) to the buffer columns; missing ones are NaN."""
+    timestamps = _naive(frame["timestamp"])
+    rows = frame.reindex(columns=columns).to_numpy(dtype=float)
+    return timestamps, rows
+
+
+class IngestAdapter:
+    """
+    Base class of the live ingest adapters. An adapter runs in a daemon thread and appends every reading it
+    receives to the buffer passed to start(); the dashboard only ever reads from that buffer.
+    """
+    name = "base"
+
+    def __init__(self):
+        self.buffer = None
+        self.rows_received = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, buffer):
+        self.buffer = buffer
+        self._thread = threading.Thread(target=self.run, name=f"ingest-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def run(self):
+        raise NotImplementedError
+
+    def _append(self, timestamps, rows):
+        if len(rows):
+            self.buffer.append_many(timestamps, rows)
+            self.rows_received += len(rows)
+
+
+class SimulatorAdapter(IngestAdapter):
+    """Replays the stored merged data as a live feed at `rate` rows per second, looping at the end."""
+    name = "simulator"
+
+    def __init__(self, data_file=DATA_FILE, rate=SIM_RATE, tick=0.05):
+        super().__init__()
+        self.frame = read_csv_cached(data_file)
+        self.rate = rate
+        self.tick = tick
+
+    def run(self):
+        timestamps, rows = _frame_to_rows(self.frame, self.buffer.columns)
+        position, due = 0, 0.0
+        last = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            due += (now - last) * self.rate
+            last = now
+            # send everything that became due since the last tick as one batch
+            n = int(due)
+            if n:
+                due -= n
+                take = (position + np.arange(n)) % len(rows)
+                self._append(timestamps[take], rows[take])
+                position = (position + n) % len(rows)
+            self._stop.wait(self.tick)
+
+
+class FileTailAdapter(IngestAdapter):
+    """
+    Follows a CSV file that another process appends to (header line with a timestamp column plus sensor columns).
+    Only complete new lines are parsed, in one batch per poll.
+    """
+    name = "file"
+
+    def __init__(self, path=TAIL_FILE, poll=0.5, from_start=False):
+        super().__init__()
+        self.path = path
+        self.poll = poll
+        self.from_start = from_start
+
+    def run(self):
+        # the feed may not exist yet: keep waiting for it until it appears or the adapter is stopped
+        while not self._stop.is_set():
+            try:
+                f = open(self.path, "r", encoding="utf-8")
+            except FileNotFoundError:
+                self._stop.wait(self.poll)
+                continue
+            with f:
+                self._follow(f)
+            return
+
+    def _follow(self, f):
+        header = f.readline()
+        if not self.from_start:
+            f.seek(0, os.SEEK_END)
+        pending = ""
+        while not self._stop.is_set():
+            chunk = f.read()
+            if not chunk:
+                self._stop.wait(self.poll)
+                continue
+            # keep a partially written last line for the next poll
+            pending += chunk
+            complete, _, pending = pending.rpartition("\n")
+            if complete:
+                frame = pd.read_csv(io.StringIO(header + complete + "\n"))
+                self._append(*_frame_to_rows(frame, self.buffer.columns))
+
+
+class HttpPushAdapter(IngestAdapter):
+    """
+    Small HTTP endpoint for sensors that push their readings:
+      POST /readings  JSON {"timestamp": ..., "values": {sensor: count, ...}} or a list of those,
+                      or CSV text (Content-Type: text/csv) with a header line like the file tailer.
+    Answers 202 with the number of rows accepted. Each request is handled in its own thread.
+    """
+    name = "http"
+
+    def __init__(self, host=HTTP_HOST, port=HTTP_PORT):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def parse(self, body, content_type):
+        if content_type.startswith("text/csv"):
+            return _frame_to_rows(pd.read_csv(io.BytesIO(body)), self.buffer.columns)
+        payload = json.loads(body)
+        readings = payload if isinstance(payload, list) else [payload]
+        positions = {col: i for i, col in enumerate(self.buffer.columns)}
+        rows = np.full((len(readings), len(self.buffer.columns)), np.nan)
+        for r, reading in enumerate(readings):
+            for sensor, value in reading["values"].items():
+                if sensor in positions:
+                    rows[r, positions[sensor]] = value
+        return _naive([reading["timestamp"] for reading in readings]), rows
+
+    def run(self):
+        adapter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.rstrip("/") != "/readings":
+                    self.send_error(404)
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                try:
+                    timestamps, rows = adapter.parse(body, self.headers.get("Content-Type", "application/json"))
+                except (ValueError, KeyError, TypeError) as e:
+                    self.send_error(400, f"Invalid readings: {e}")
+                    return
+                adapter._append(timestamps, rows)
+                reply = json.dumps({"accepted": len(rows)}).encode("utf-8")
+                self.send_response(202)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, format, *args):
+                pass  # one line per POST would flood the dashboard log
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        print(f"[ingest] listening on http://{self.host}:{self.port}/readings", flush=True)
+        self.server.serve_forever(poll_interval=0.5)
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+        super().stop()
+
+
+ADAPTERS = {"simulator": SimulatorAdapter, "file": FileTailAdapter, "http": HttpPushAdapter}
+
+def make_adapter(kind=INGEST_KIND, **kwargs):
+    try:
+        return ADAPTERS[kind](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown SENSOR_INGEST adapter {kind!r}, choose one of {sorted(ADAPTERS)}") from None
+
+def start_ingest(columns, kind=INGEST_KIND, capacity=BUFFER_ROWS, **kwargs):
+    """Creates the shared buffer for `columns` and starts the chosen adapter filling it."""
+    buffer = RingBuffer(capacity, columns)
+    adapter = make_adapter(kind, **kwargs).start(buffer)
+    print(f"[ingest] {adapter.name} adapter started, buffer holds {capacity:,} rows", flush=True)
+    return buffer, adapter
+
+
+# ---------- CLI: measure ingest throughput with the local simulator ----------
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Run an ingest adapter and report its throughput.")
+    ap.add_argument("--adapter", default=INGEST_KIND or "simulator", choices=sorted(ADAPTERS))
+    ap.add_argument("--rate", type=float, default=100, help="Simulator rows per second.")
+    ap.add_argument("--seconds", type=float, default=5, help="How long to run.")
+    args = ap.parse_args()
+
+    kwargs = {"rate": args.rate} if args.adapter == "simulator" else {}
+    columns = pd.read_csv(DATA_FILE, nrows=0).columns.drop("timestamp")
+    buffer, adapter = start_ingest(columns, args.adapter, **kwargs)
+    time.sleep(args.seconds)
+    adapter.stop()
+    readings = adapter.rows_received * len(columns)
+    print(f"[ingest] {adapter.rows_received:,} rows / {readings:,} readings in {args.seconds:g}s "
+          f"→ {readings / args.seconds:,.0f} readings/s", flush=True)
@@ -1,8 +1,12 @@
+import threading
 import folium
+import numpy as np
 import pandas as pd
 import streamlit as st
 import folium.plugins
 from folium.plugins import HeatMap
+from folium.utilities import JsCode
+from streamlit_folium import st_folium
 
 
 def init_map(map_style, center, zoom):
@@ -35,244 +39,125 @@ def init_map(map_style, center, zoom):
     
     return m
 
+# Colour bins for the sensor layers: values up to thresholds[i] get colors[i], anything above the last threshold gets the last colour
+COUNT_CIRCLE_BINS = ([50, 100, 150], ["#05FA05", '#FFFF00', '#FFA500', '#FF0000'])  # green, yellow, orange, red
+FLOW_CIRCLE_BINS = ([1, 6, 12], ['#00FF00', '#FFFF00', '#FFA500', '#FF0000'])
+COUNT_ARROW_BINS = ([20, 50, 80], ['#00FF00', '#FFFF00', '#FFA500', '#FF0000'])
+FLOW_ARROW_BINS = ([1, 5, 10], ['#00FF00', '#FFFF00', '#FFA500', '#FF0000'])
+
+# The popup/icon HTML is built once in the browser from the feature properties instead of once per sensor in Python
+CIRCLE_JS = JsCode("""
+function(feature, layer) {
+    var p = feature.properties;
+    layer.setStyle({color: p.color, fill: true, fillColor: p.color, fillOpacity: 0.6});
+    layer.setRadius(p.radius);
+    layer.bindPopup("<b>" + p.name + "<b><br>Objectummer: " + p.object + "<br>Intensity: " + p.intensity);
+}
+""")
+
+ARROW_JS = JsCode("""
+function(feature, layer) {
+    var p = feature.properties;
+    layer.setIcon(L.divIcon({className: "empty", html:
+        '<div style="font-size: 24px; transform: rotate(' + p.direction + 'deg); color: ' + p.color + '; font-weight: bold;">→</div>'}));
+    layer.bindPopup("<b>" + p.name + "</b><br>Objectummer: " + p.object + "<br>Intensity: " + p.intensity
+        + "<br>Direction: " + p.direction + "°", {maxWidth: 300});
+}
+""")
+
+LABEL_JS = JsCode("""
+function(feature, layer) {
+    layer.setIcon(L.divIcon({className: "empty", html:
+        '<div style="font-size: 12px; color: white; background-color: rgba(0, 0, 0, 0.8); padding: 3px 6px; '
+        + 'border-radius: 4px; display: inline-block; white-space: nowrap; text-align: center;">'
+        + feature.properties.object + '</div>'}));
+}
+""")
+
+MARKER_JS = JsCode("""
+function(feature, layer) {
+    var p = feature.properties;
+    layer.bindPopup(p.name + " (" + p.object + ")");
+    layer.bindTooltip(p.name);
+}
+""")
+
+
+def color_bins(values, bins):
+    thresholds, colors = bins
+    # NaN sorts after every threshold, so it gets the last colour just like the old if/elif chains
+    return np.asarray(colors)[np.searchsorted(thresholds, values, side='left')]
+
+def _feature_collection(geometry, keep, **properties):
+    """GeoJSON FeatureCollection with one Point per kept sensor; properties are arrays in geometry order."""
+    lon = geometry.lon[keep].tolist()
+    lat = geometry.lat[keep].tolist()
+    names = list(properties)
+    columns = [np.asarray(values)[keep].tolist() for values in properties.values()]
+    features = [
+        {"type": "Feature",
+         "geometry": {"type": "Point", "coordinates": [x, y]},
+         "properties": dict(zip(names, values))}
+        for x, y, *values in zip(lon, lat, *columns)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
 # Add sensor markers if turned on
 def add_sensor_markers(m, sensor_loc):      
-    missing_rows = [] # List to store rows with missing data
-    for idx, row in sensor_loc.iterrows():
-        # check if any critical column is missing
-        if row[['Lat', 'Lon','Locatienaam','Objectummer']].isnull().any():
-            missing_rows.append(idx)
-            continue 
-        folium.Marker(
-            location=[row['Lat'], row['Lon']],
-            popup=f"{row['Locatienaam']} ({row['Objectummer']})",
-            tooltip=row['Locatienaam'],
-            icon=folium.Icon(
-                color='red',         # Base color of the marker
-                icon='map-marker',   # Options: 'map-marker', 'map-marker-alt', or 'thumbtack'
-                prefix='fa'
-            )
-        ).add_to(m)
-    return missing_rows #to announce to user if there is data
+    data = _feature_collection(sensor_loc, sensor_loc.valid, name=sensor_loc.names, object=sensor_loc.objects)
+    folium.GeoJson(
+        data,
+        name="Sensor Markers",
+        marker=folium.Marker(icon=folium.Icon(color='red', icon='map-marker', prefix='fa')),
+        on_each_feature=MARKER_JS,
+    ).add_to(m)
+    return list(sensor_loc.missing_rows) #to announce to user if there is data
 
 # Add sensor labels
 def add_sensor_labels(m, sensor_loc):
-    missing_rows = [] # List to store rows with missing data
-    for idx, row in sensor_loc.iterrows():
-        # check if any critical column is missing
-        if row[['Lat', 'Lon','Locatienaam','Objectummer']].isnull().any():
-            missing_rows.append(idx)
-            continue # skip this row
-        folium.map.Marker(
-            [row['Lat'], row['Lon']],
-            icon=folium.DivIcon(
-                html=f"""
-                    <div style="
-                        font-size: 12px;
-                        color: white;
-                        background-color: rgba(0, 0, 0, 0.8);
-                        padding: 3px 6px;
-                        border-radius: 4px;
-                        display: inline-block;
-                        white-space: nowrap;
-                        text-align: center;">
-                        {row['Objectummer']}
-                    </div>
-                """
-            )
-        ).add_to(m)
-        # ---- Display missing rows info on Streamlit ---
-    return missing_rows
+    data = _feature_collection(sensor_loc, sensor_loc.valid, object=sensor_loc.objects)
+    folium.GeoJson(data, name="Sensor Labels", marker=folium.Marker(icon=folium.DivIcon()),
+                   on_each_feature=LABEL_JS).add_to(m)
+    return list(sensor_loc.missing_rows)
+
+def _add_circles(m, sensor_loc, sensor_data, bins, scale, name):
+    counts = sensor_loc.values_for(sensor_data)
+    # sensors without a value in sensor_data are not drawn
+    data = _feature_collection(sensor_loc, sensor_loc.valid & ~np.isnan(counts),
+                               color=color_bins(counts, bins),
+                               radius=2 + counts * scale, # scale radius to make differences visible
+                               intensity=counts,
+                               name=sensor_loc.names,
+                               object=sensor_loc.objects)
+    folium.GeoJson(data, name=name, marker=folium.CircleMarker(), on_each_feature=CIRCLE_JS).add_to(m)
+    return list(sensor_loc.missing_rows)
 
 # Add sensor circles for crowd flow
 def add_flow_sensor_circles(m, sensor_loc, sensor_data):
-    missing_rows = [] # List to store rows with missing data
-    for i, row in sensor_loc.iterrows():
-        # check if any critical column is missing
-        if row[['Lat', 'Lon','Locatienaam','Objectummer']].isnull().any():
-            missing_rows.append(i)
-            continue # skip this row
-        # Get crowd data from sensor_data
-        sensor_id = row['sensor_id_full']
-        sensor_count = sensor_data[sensor_id][0]
-        #sensor_count = sensor_data.get(sensor_id, [None])[0]
-        #if sensor_count is None or pd.isna(sensor_count):
-            #continue
-        # Map intensity to color and radius dynamically
-        if sensor_count <= 1:
-            color = '#00FF00'   # green (low)
-        elif sensor_count <= 6:
-            color = '#FFFF00'   # yellow (medium)
-        elif sensor_count <= 12:
-            color = '#FFA500'   # orange (high)
-        else:
-            color = '#FF0000'   # red (very high)
-
-        radius = 2 + (sensor_count * 1) # scale radius to make differences visible
-
-        # Add circle overlay
-        folium.CircleMarker(
-            location =[row['Lat'],row['Lon']],
-            radius = radius,
-            color=color,
-            fill = True,
-            fill_color = color,
-            fill_opacity = 0.6,
-            popup=f"""
-                <b>{row['Locatienaam']}<b><br>
-                Objectummer: {row['Objectummer']}<br>
-                Intensity: {sensor_count}
-            """
-        ).add_to(m)
-        #Display missing rows info on Streamlit
-    return missing_rows
-    #if missing_rows:
-        #st.warning(f"Skipped {len(missing_rows)} row(s) due to missing data: {missing_rows}")
+    return _add_circles(m, sensor_loc, sensor_data, FLOW_CIRCLE_BINS, 1, "Crowd Flow")
 
 # Add sensor circles 
 def add_sensor_circles(m, sensor_loc, sensor_data):
-    missing_rows = [] # List to store rows with missing data
-    for i, row in sensor_loc.iterrows():
-        # check if any critical column is missing
-        if row[['Lat', 'Lon','Locatienaam','Objectummer']].isnull().any():
-            missing_rows.append(i)
-            continue # skip this row
-        # Get crowd data from sensor_data
-        sensor_id = row['sensor_id_full']
-        sensor_count = sensor_data[sensor_id][0]
-        #sensor_count = sensor_data.get(sensor_id, [None])[0]
-        #if sensor_count is None or pd.isna(sensor_count):
-            #continue
-        # Map intensity to color and radius dynamically
-        if sensor_count <= 50:
-            color = "#05FA05"   # green (low)
-        elif sensor_count <= 100:
-            color = '#FFFF00'   # yellow (medium)
-        elif sensor_count <= 150:
-            color = '#FFA500'   # orange (high)
-        else:
-            color = '#FF0000'   # red (very high)
-
-        radius = 2 + (sensor_count * 0.2) # scale radius to make differences visible
-
-        # Add circle overlay
-        folium.CircleMarker(
-            location =[row['Lat'],row['Lon']],
-            radius = radius,
-            color=color,
-            fill = True,
-            fill_color = color,
-            fill_opacity = 0.6,
-            popup=f"""
-                <b>{row['Locatienaam']}<b><br>
-                Objectummer: {row['Objectummer']}<br>
-                Intensity: {sensor_count}
-            """
-        ).add_to(m)
-        #Display missing rows info on Streamlit
-    return missing_rows
+    return _add_circles(m, sensor_loc, sensor_data, COUNT_CIRCLE_BINS, 0.2, "Crowd Count")
+
+def _add_arrows(m, sensor_loc, sensor_data, bins, name):
+    counts = sensor_loc.values_for(sensor_data, default=0)
+    # Skip if any critical value is missing
+    data = _feature_collection(sensor_loc, sensor_loc.valid_direction,
+                               color=color_bins(counts, bins),
+                               direction=sensor_loc.direction,
+                               intensity=counts,
+                               name=sensor_loc.names,
+                               object=sensor_loc.objects)
+    folium.GeoJson(data, name=name, marker=folium.Marker(icon=folium.DivIcon()), on_each_feature=ARROW_JS).add_to(m)
+    return list(sensor_loc.missing_direction_rows)
 
 def add_sensor_arrows(m, sensor_loc, sensor_data):
-    missing_rows = []
-
-    for i, row in sensor_loc.iterrows():
-        # Skip if any critical value is missing
-        if row[['Lat', 'Lon', 'Locatienaam', 'Objectummer', 'sensor_direction']].isnull().any():
-            missing_rows.append(i)
-            continue
-
-        lat = row['Lat']
-        lon = row['Lon']
-        direction = row['sensor_direction']
-        sensor_id = row['sensor_id_full']
-
-        # Get crowd count from sensor_data
-        count = sensor_data.get(sensor_id, [0])[0]
-
-        # Define color based on count
-        if count <= 20:
-            color = '#00FF00'  # green
-        elif count <= 50:
-            color = '#FFFF00'  # yellow
-        elif count <= 80:
-            color = '#FFA500'  # orange
-        else:
-            color = '#FF0000'  # red
-
-        # Add arrow marker using direction
-        folium.Marker(
-            location=[lat, lon],
-            icon=folium.DivIcon(
-                html=f"""
-                    <div style="
-                        font-size: 24px;
-                        transform: rotate({direction}deg);
-                        color: {color};
-                        font-weight: bold;
-                    ">→</div>
-                """
-            ),
-            popup=folium.Popup(f"""
-                <b>{row['Locatienaam']}</b><br>
-                Objectummer: {row['Objectummer']}<br>
-                Intensity: {count}<br>
-                Direction: {direction}°
-            """, max_width=300)
-        ).add_to(m)
-
-    # Warning for skipped rows
-    return missing_rows
+    return _add_arrows(m, sensor_loc, sensor_data, COUNT_ARROW_BINS, "Crowd Direction")
 
 def add_flow_sensor_arrows(m, sensor_loc, sensor_data):
-    missing_rows = []
-
-    for i, row in sensor_loc.iterrows():
-        # Skip if any critical value is missing
-        if row[['Lat', 'Lon', 'Locatienaam', 'Objectummer', 'sensor_direction']].isnull().any():
-            missing_rows.append(i)
-            continue
-
-        lat = row['Lat']
-        lon = row['Lon']
-        direction = row['sensor_direction']
-        sensor_id = row['sensor_id_full']
-
-        # Get crowd count from sensor_data
-        count = sensor_data.get(sensor_id, [0])[0]
-
-        # Define color based on count
-        if count <= 1:
-            color = '#00FF00'  # green
-        elif count <= 5:
-            color = '#FFFF00'  # yellow
-        elif count <= 10:
-            color = '#FFA500'  # orange
-        else:
-            color = '#FF0000'  # red
-
-        # Add arrow marker using direction
-        folium.Marker(
-            location=[lat, lon],
-            icon=folium.DivIcon(
-                html=f"""
-                    <div style="
-                        font-size: 24px;
-                        transform: rotate({direction}deg);
-                        color: {color};
-                        font-weight: bold;
-                    ">→</div>
-                """
-            ),
-            popup=folium.Popup(f"""
-                <b>{row['Locatienaam']}</b><br>
-                Objectummer: {row['Objectummer']}<br>
-                Intensity: {count}<br>
-                Direction: {direction}°
-            """, max_width=300)
-        ).add_to(m)
-
-    # Warning for skipped rows
-    return missing_rows
+    return _add_arrows(m, sensor_loc, sensor_data, FLOW_ARROW_BINS, "Crowd Flow Direction")
 
 def add_stops_circles(m, tram_metro_gdf):
     tram_metro_stop_group = folium.FeatureGroup(name="Tram/Metro Stops", show=True)
@@ -290,20 +175,56 @@ def add_stops_circles(m, tram_metro_gdf):
     tram_metro_stop_group.add_to(m)
 
 def add_heatmap(m, sensor_loc, sensor_data):
-    heat_data = []
-    missing_rows = []  
-    for i, row in sensor_loc.iterrows():
-        if row[['Lat', 'Lon', 'Locatienaam', 'Objectummer']].isnull().any():
-            missing_rows.append(i)
-            continue 
-
-        sensor_id = row['sensor_id_full']
-        sensor_count = sensor_data.get(sensor_id, [0])[0] 
-
-        if sensor_count > 0:
-            heat_data.append([float(row['Lat']), float(row['Lon']), float(sensor_count)])
-
-    if heat_data:
-        HeatMap(heat_data, radius=15, blur=10, max_zoom=1).add_to(m)
-
-    return missing_rows
\ No newline at end of file
+    counts = sensor_loc.values_for(sensor_data, default=0)
+    keep = sensor_loc.valid & (counts > 0)
+    heat_data = np.column_stack([sensor_loc.lat[keep], sensor_loc.lon[keep], counts[keep]])
+
+    if len(heat_data):
+        HeatMap(heat_data.tolist(), radius=15, blur=10, max_zoom=1).add_to(m)
+
+    return list(sensor_loc.missing_rows)
+
+# Heatmap rendered on the server as one image, cached per cache_key (timestamp and dataset)
+def add_heatmap_raster(m, sensor_loc, sensor_data, cache_key):
+    from heatmap_raster import heatmap_image
+    image_url, bounds = heatmap_image(cache_key, sensor_loc, sensor_loc.values_for(sensor_data, default=0))
+    folium.raster_layers.ImageOverlay(image_url, bounds=bounds, name="Heatmap", pixelated=False).add_to(m)
+    return list(sensor_loc.missing_rows)
+
+
+# Center/zoom the cached base map is built with; the live view is passed to st_folium on every rerun instead
+DEFAULT_CENTER = [52.37, 4.89]
+DEFAULT_ZOOM = 13
+
+
+class BaseMap:
+    """
+    Static part of the home map: tiles, sensor markers, sensor labels and tram/metro stops.
+    Built once per style/layer combination and shared by all sessions, so a refresh only builds the live layers
+    (circles, arrows, heatmap). st_folium has no data-only update: it still sends the base map's script with every
+    refresh, but since that script does not change the browser keeps the map and only swaps the live feature group.
+    """
+
+    def __init__(self, map_style, sensor_loc, tram_metro_gdf, show_sensor_loc, show_sensor_labels, show_tram_metro_stops):
+        self.map = init_map(map_style, DEFAULT_CENTER, DEFAULT_ZOOM)
+        self.skipped_rows = set()
+        if show_sensor_loc:
+            self.skipped_rows.update(add_sensor_markers(self.map, sensor_loc))
+        if show_sensor_labels:
+            self.skipped_rows.update(add_sensor_labels(self.map, sensor_loc))
+        if show_tram_metro_stops:
+            add_stops_circles(self.map, tram_metro_gdf)
+        # st_folium attaches the feature groups to the map it renders, so sessions take turns
+        self._lock = threading.Lock()
+
+    def render(self, feature_groups, center, zoom, **kwargs):
+        """Shows the map with this refresh's live layers at the given view and returns st_folium's output."""
+        if isinstance(center, dict):
+            center = [center['lat'], center['lng']]
+        with self._lock:
+            try:
+                return st_folium(self.map, feature_group_to_add=feature_groups, center=center, zoom=zoom, **kwargs)
+            finally:
+                # detach the live layers again so the cached map (and its hash in the browser) stays the same
+                for group in feature_groups:
+                    self.map._children.pop(group.get_name(), None)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from crowd_model import load_crowd_model
+from crowd_model import native_paths
+
+# Optional manifest with per-sensor / per-cluster models, e.g.
+# {
+#   "models":  {"gasa": "Notebooks/models/gasa.pkl", "GASA-02-02_135": "Notebooks/models/GASA-02-02_135.pkl"},
+#   "sensors": {"GASA-01-A1_135": "gasa", "GASA-01-A1_315": "gasa", "GASA-02-02_135": "GASA-02-02_135"}
+# }
+# Sensors without an entry use the global model.
+REGISTRY_FILE = "Notebooks/models/registry.json"
+GLOBAL = "global"
+
+
+class ModelRegistry:
+    """
+    Global crowd model plus optional per-sensor or per-cluster models.
+    Models are loaded on first use and evicted again when they have not been used for idle_seconds
+    or when more than max_loaded of them are in memory (the global model always stays).
+    predict() routes every row to the model of its sensor, so the registry can be used wherever a single model was.
+    """
+
+    def __init__(self, global_path, sensor_cols, expected_features, models=None, assignments=None,
+                 max_loaded=4, idle_seconds=900):
+        self.paths = {GLOBAL: str(global_path), **{name: str(path) for name, path in (models or {}).items()}}
+        self.sensor_cols = list(sensor_cols)
+        self.feature_names = list(expected_features)
+        self.max_loaded = max_loaded
+        self.idle_seconds = idle_seconds
+        assignments = assignments or {}
+        unknown = set(assignments.values()) - set(self.paths)
+        if unknown:
+            raise ValueError(f"Registry assigns sensors to unknown models: {sorted(unknown)}")
+        # model name per location_id (position of the sensor in sensor_cols)
+        self.assigned = np.array([assignments.get(sensor, GLOBAL) for sensor in self.sensor_cols], dtype=object)
+        self._loaded = OrderedDict()  # name -> (model, last used)
+        self._lock = threading.Lock()
+        self.fingerprint = self._fingerprint()
+
+    @classmethod
+    def from_manifest(cls, manifest_path, global_path, sensor_cols, expected_features, **kwargs):
+        """Registry described by a JSON manifest; without a manifest only the global model is used."""
+        if not Path(manifest_path).exists():
+            return cls(global_path, sensor_cols, expected_features, **kwargs)
+        manifest = json.loads(Path(manifest_path).read_text())
+        return cls(global_path, sensor_cols, expected_features,
+                   models=manifest.get("models"), assignments=manifest.get("sensors"), **kwargs)
+
+    def _fingerprint(self):
+        """
+        Hash of the routing and of the size/mtime of the files every model is loaded from (the native .ubj and
+        its .schema.json, not the legacy .pkl), computed without loading any model.
+        """
+        parts = [list(self.assigned)]
+        for name, path in sorted(self.paths.items()):
+            for artifact in map(str, native_paths(path)):
+                stat = os.stat(artifact) if os.path.exists(artifact) else None
+                parts.append([name, artifact, stat.st_mtime_ns if stat else None, stat.st_size if stat else None])
+        return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()[:16]
+
+    def model_name_for(self, sensor):
+        return self.assigned[self.sensor_cols.index(sensor)]
+
+    def get(self, name):
+        """Returns the loaded model, loading it on first use and evicting idle or least recently used models."""
+        with self._lock:
+            now = time.time()
+            entry = self._loaded.pop(name, None)
+            model = entry[0] if entry else load_crowd_model(self.paths[name], expected_features=self.feature_names)
+            self._loaded[name] = (model, now)
+            for other in list(self._loaded):
+                idle = now - self._loaded[other][1] > self.idle_seconds
+                too_many = len(self._loaded) > self.max_loaded
+                if other not in (name, GLOBAL) and (idle or too_many):
+                    del self._loaded[other]
+            return model
+
+    def loaded(self):
+        return list(self._loaded)
+
+    def predict(self, X):
+        """Predicts every row with the model of its sensor (taken from the location_id column)."""
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_names].to_numpy(dtype=np.float32)
+        X = np.asarray(X, dtype=np.float32)
+        names = self.assigned[X[:, self.feature_names.index("location_id")].astype(int)]
+        pred = np.empty(len(X), dtype=np.float32)
+        for name in pd.unique(names):
+            rows = names == name
+            pred[rows] = self.get(name).predict(X[rows])
+        return pred
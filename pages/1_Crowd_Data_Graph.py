@@ -1,15 +1,15 @@
 # pages/1_Crowd_Data_Line_Graph.py
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 import time #to work with the time in the dataset
 from streamlit_autorefresh import st_autorefresh #allows the auto refresh of the dashbaord
 
 #import sys, os
 #sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from data_loader import (init_data_stream, load_live_sensor_data, load_sensor_data)
-from calculate_crowd_flow import add_new_row
+from data_loader import (init_data_stream, load_live_sensor_data)
+from calculate_crowd_flow import add_new_row, get_shared_series
+from replay import get_replay_clock
+from plot_utils import MAX_POINTS, line_figure
 
 #check whether user is logged in. Only then the page is loaded - only activate upon final implementation
 from security import check_login_status 
@@ -22,20 +22,6 @@ st.set_page_config(page_title="Crowd Data Line Graph", page_icon="📈", layout=
 st.title("Crowd Data Line Graph")
 
 
-# Initializes count_frame if it doesn't exist yet
-if "count_frame" not in st.session_state:
-    # load data sets
-    sensor_data = load_sensor_data()
-
-    # Remove unwanted columns if they exist
-    sensor_data = sensor_data.drop(columns=[col for col in ['level_0', 'index'] if col in sensor_data.columns])
-
-    # Select the first row to initialize count_frame
-    first_row = sensor_data.iloc[0]
-
-    st.session_state.count_frame = pd.DataFrame([first_row], columns=sensor_data.columns)
-
-
 REFRESH_INTERVAL = 5  # 5 seconds, this will be changed to milliseconds later in the code. As otherwise, this would have too many '0's'
 
 # 1. Initialize session state on the first run
@@ -54,42 +40,39 @@ if time.time() - st.session_state.last_refresh > REFRESH_INTERVAL:
     sensor_data, timestamp = load_live_sensor_data()
     st.session_state.sensor_data = sensor_data
     st.session_state.current_timestamp = timestamp
-    count_frame = add_new_row(st.session_state.current_timestamp)  # Updating crowd flow dataset for current timestamp
-    st.session_state.count_frame = count_frame
+    add_new_row(st.session_state.current_timestamp, get_replay_clock().generation, sensor_data)  # Updating the shared count history for current timestamp
     st.session_state.last_refresh = time.time()
 
 
-# Load data
-#sensor_data = load_sensor_data()
-count_frame = st.session_state.count_frame
+# Load data: the count history is shared by all sessions, this session only keeps a read cursor
+series = get_shared_series()
+cursor = series.cursor()
 current_timestamp = st.session_state.current_timestamp
 
 
-# converts dataset into longformat for plotly express
-#count_frame = count_frame.reset_index()
-sensor_data_long = count_frame.melt(
-    id_vars=["timestamp", "hour", "minute", "day", "month", "weekday", "is_weekend"],
-    var_name="sensor_id",
-    value_name="flow_count"
-)
-
-
 # Sidebar controls
-sensor_options = sensor_data_long["sensor_id"].unique()
+sensor_options = series.count_matrix.columns
 selected_options = st.sidebar.multiselect("Select sensors to display",
                                           options = sensor_options,
                                           default = "CMSA-GAKH-01_0"
                                           )
-
-
-# creates a dataset that only includes the selected sensors
-filtered_sensors = sensor_data_long[sensor_data_long["sensor_id"].isin(selected_options)]
-#st.write(filtered_sensors)
-
-# Plot line graph
-fig = px.line(filtered_sensors, x="timestamp", y="flow_count", color="sensor_id", title="Crowd Count")
-#fig.show()
-
-fig.update_layout(xaxis_title="Time", yaxis_title="Crowd Count", legend_title="Sensor Names")
-
-st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+downsampling = st.sidebar.selectbox("Downsampling for long windows", ["lttb", "minmax"],
+                                    format_func={"lttb": "LTTB (shape)", "minmax": "Min/Max (peaks)"}.get,
+                                    help=f"Only used when the history holds more than {MAX_POINTS:,} rows "
+                                         "(a CROWD_HISTORY_HOURS above ~50 h); shorter histories are drawn in full.")
+
+
+# The figure is only rebuilt when the shared history or the sensor selection changed since the last read
+plot_key = (cursor, tuple(selected_options), downsampling)
+if st.session_state.get("count_plot_key") != plot_key:
+    # only the selected columns of the wide history go into the chart, as WebGL traces downsampled to the chart width
+    # read under the series lock; the key keeps the cursor of the rows that were actually drawn
+    cursor, timestamps, selected_counts = series.count_history(selected_options)
+    plot_key = (cursor, tuple(selected_options), downsampling)
+    fig = line_figure(timestamps, selected_counts, selected_options, method=downsampling, title="Crowd Count")
+
+    fig.update_layout(xaxis_title="Time", yaxis_title="Crowd Count", legend_title="Sensor Names")
+    st.session_state.count_plot = fig
+    st.session_state.count_plot_key = plot_key
+
+st.plotly_chart(st.session_state.count_plot, use_container_width=True)
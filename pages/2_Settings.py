@@ -25,7 +25,10 @@ default_settings = {
     "show_sensor_labels": False,
     "show_sensor_data": True,
     "show_tram_metro_stops": False,
-    "show_heatmap": False
+    "show_heatmap": False,
+    "static_base_map": True,
+    "map_engine": "folium",
+    "heatmap_engine": "client"
 }
 
 for key, value in default_settings.items():
@@ -46,6 +49,13 @@ with st.form("settings_form"):
                      "CartoDB Dark_Matter"].index(st.session_state.map_style)
     )
 
+    map_engine = st.selectbox(
+        "Map engine",
+        ["folium", "pydeck"],
+        index = ["folium", "pydeck"].index(st.session_state.map_engine),
+        help = "pydeck draws the sensors on the GPU and scales better to fast refreshes and many sensors"
+    )
+
     st.subheader("Data Layers")
     show_sensor_arrows = st.checkbox("Show crowd direction (arrows)", st.session_state.show_sensor_arrows)
     show_sensor_loc = st.checkbox("Show sensor locations (markers)", st.session_state.show_sensor_loc)
@@ -54,6 +64,15 @@ with st.form("settings_form"):
     show_tram_metro_stops = st.checkbox("Show Tram & Metro Stops (circles)", st.session_state.show_tram_metro_stops)
     show_heatmap = st.checkbox("Show heatmap", st.session_state.show_heatmap)
 
+    st.subheader("Performance")
+    heatmap_engine = st.selectbox(
+        "Heatmap rendering",
+        ["client", "server"],
+        index = ["client", "server"].index(st.session_state.heatmap_engine),
+        help = "server computes the density grid once per timestamp and sends it as a single image"
+    )
+    static_base_map = st.checkbox("Cache the base map and only rebuild the live layers on refresh", st.session_state.static_base_map)
+
     submitted = st.form_submit_button("Save Settings")
 
     if submitted:
@@ -64,5 +83,8 @@ with st.form("settings_form"):
         st.session_state.show_sensor_data = show_sensor_data
         st.session_state.show_tram_metro_stops = show_tram_metro_stops
         st.session_state.show_heatmap = show_heatmap
+        st.session_state.static_base_map = static_base_map
+        st.session_state.map_engine = map_engine
+        st.session_state.heatmap_engine = heatmap_engine
 
         st.success("Settings saved successfully! Go back to the Home page to view changes.")
\ No newline at end of file
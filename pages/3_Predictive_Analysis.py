@@ -1,10 +1,15 @@
 import streamlit as st
 import pandas as pd
-import joblib
+import os
 from datetime import timedelta
 import time
 import plotly.graph_objects as go
-from data_loader import load_live_sensor_data
+from data_loader import load_live_sensor_data, load_sensor_store
+from forecast_cache import ForecastCache
+from feature_builder import IncrementalFeatureBuilder
+from model_registry import ModelRegistry, REGISTRY_FILE
+from crowd_model import native_paths
+from forecast_worker import ForecastWorker
 from streamlit_autorefresh import st_autorefresh
 
 #check whether user is logged in. Only then the page is loaded - only activate upon final implementation
@@ -17,52 +22,33 @@ st.title("Crowd Prediction Dashboard")
 
 # Functions
 
-def create_features(df, sensor_cols, feature_cols, 
-                    lags=[1,2,3,5,10,20,30,40,50,60,75],
-                    rolling_windows=[3,5,10,20,40,60],
-                    dropna=True):
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df = df.set_index('timestamp')
-    df_long = df[sensor_cols].reset_index().melt(
-        id_vars='timestamp',
-        value_vars=sensor_cols,
-        var_name='location',
-        value_name='count'
-    )
-    df_long = df_long.merge(df[feature_cols].reset_index(), on='timestamp', how='left')
-    loc_map = {loc: i for i, loc in enumerate(sensor_cols)}
-    df_long['location_id'] = df_long['location'].map(loc_map)
-    df_long = df_long.sort_values(['location_id', 'timestamp'])
-    for lag in lags:
-        df_long[f'lag_{lag}'] = df_long.groupby('location_id')['count'].shift(lag)
-    for w in rolling_windows:
-        df_long[f'roll_mean_{w}'] = df_long.groupby('location_id')['count'].rolling(w).mean().reset_index(level=0, drop=True)
-    if dropna:
-        df_long = df_long.dropna()
-    return df_long
-
-
-def recursive_forecast(model, incoming_df, sensor_cols, feature_cols,
-                       selected_sensor, current_timestamp,
-                       steps=20, interval_minutes=3):
-    forecast_results = []
-    df_future = incoming_df.copy().set_index('timestamp')
-    for step in range(1, steps + 1):
-        ts = current_timestamp + pd.Timedelta(minutes=interval_minutes * step)
-        feat_df = create_features(df_future.reset_index(), sensor_cols, feature_cols, dropna=False)
-        latest_row = feat_df[feat_df["location"] == selected_sensor].sort_values("timestamp").tail(1)
-        X_input = latest_row.drop(columns=["count", "location", "timestamp"])
-        pred_val = model.predict(X_input)[0]
-        forecast_results.append((ts, pred_val))
-        # Append prediction for next step
-        new_row = {"timestamp": ts}
-        for col in sensor_cols:
-            new_row[col] = pred_val if col == selected_sensor else df_future[col].iloc[-1]
-        for col in feature_cols:
-            new_row[col] = df_future[col].iloc[-1]
-        df_future = pd.concat([df_future.reset_index(), pd.DataFrame([new_row])], ignore_index=True)
-        df_future = df_future.set_index('timestamp')
-    return pd.DataFrame(forecast_results, columns=["timestamp", "prediction"])
+@st.cache_resource
+def get_forecast_cache():
+    """One results table for all sessions: the forecast worker writes to it, the page only reads."""
+    return ForecastCache()
+
+
+@st.cache_resource
+def get_model_registry(model_path, model_mtimes_key, registry_path, registry_mtime_key):
+    """
+    Global model plus optional per-sensor / per-cluster models, each loaded from XGBoost's native format
+    on first use and checked against the feature builder's columns.
+    """
+    history = load_sensor_store().frame
+    sensor_cols, feature_cols = history.columns[0:-14], history.columns[-14:]
+    expected = IncrementalFeatureBuilder(sensor_cols, feature_cols).model_cols
+    return ModelRegistry.from_manifest(registry_path, model_path, sensor_cols, expected)
+
+
+@st.cache_resource
+def get_forecast_worker(_model, fingerprint, steps, interval_minutes):
+    """
+    Starts one background forecast worker per model (keyed by its fingerprint) for the whole process.
+    Page renders never run the model themselves, so their latency does not depend on the model cost.
+    """
+    history = load_sensor_store().frame
+    return ForecastWorker(_model, fingerprint, history, history.columns[0:-14], history.columns[-14:],
+                          get_forecast_cache(), steps=steps, interval_minutes=interval_minutes)
 
 
 def plot_crowd_data(selected_sensor, historic_data, current_data, latest, multi_df, interval_minutes, forecast_steps):
@@ -118,12 +104,13 @@ def plot_crowd_data(selected_sensor, historic_data, current_data, latest, multi_
 
 # Load model and data
 
-MODEL_DIR = 'Notebooks/crowd_count_model.pkl'
-DATA_FILE = 'data/crowd_weather_merged.csv'
-model = joblib.load(MODEL_DIR)
-df = pd.read_csv(DATA_FILE)
-df['timestamp'] = pd.to_datetime(df['timestamp'])
-df = df.set_index('timestamp')
+MODEL_DIR = 'Notebooks/crowd_count_model.pkl'  # base name; the model is read from the .ubj/.schema.json next to it
+# keyed on the files the loader actually reads, the legacy .pkl does not have to exist
+model_mtimes = tuple(os.path.getmtime(path) if os.path.exists(path) else 0.0 for path in native_paths(MODEL_DIR))
+registry_mtime = os.path.getmtime(REGISTRY_FILE) if os.path.exists(REGISTRY_FILE) else 0.0
+model = get_model_registry(MODEL_DIR, model_mtimes, REGISTRY_FILE, registry_mtime)
+# shared, read-only data store (parsed once per process instead of on every rerun)
+df = load_sensor_store().frame
 
 REFRESH_INTERVAL = 1  # seconds
 
@@ -156,28 +143,42 @@ current_timestamp = st.session_state.current_timestamp_predict
 sensor_data = st.session_state.live_sensor_data_predict
 current_timestamp = st.session_state.current_timestamp_predict
 
+# Forecasts run on the stored history (weather + time features); live rows from SENSOR_INGEST=file/http are not in it
+if current_timestamp not in df.index:
+    st.error(f"No forecast for {current_timestamp}: the prediction needs the stored history and its weather data, "
+             "which the live feed (SENSOR_INGEST) does not provide. Run without SENSOR_INGEST, or with the simulator, to use this page.")
+    st.stop()
+
 sensor_cols = df.columns[0:-14]
 feature_cols = df.columns[-14:]
 
 # Historic / current
 historic_data = df[df.index < current_timestamp].copy()
 current_data = df[df.index == current_timestamp].copy()
-incoming_df = pd.concat([historic_data, current_data]).reset_index()
-feature_df = create_features(incoming_df.copy(), sensor_cols, feature_cols, dropna=False)
-latest = feature_df[feature_df['timestamp'] == current_timestamp].copy()
-latest["prediction"] = model.predict(latest.drop(columns=["count", "location", "timestamp"]))
+
+# Multi-step forecast for all sensors, computed by the background worker
+FORECAST_STEPS = 20
+INTERVAL_MINUTES = 3
+worker = get_forecast_worker(model, model.fingerprint, FORECAST_STEPS, INTERVAL_MINUTES)
+worker.request(current_timestamp)
+forecast_all = worker.result(current_timestamp)
 
 
 # Interactive sensor selection
 
 selected_sensor = st.selectbox("Select a sensor to view", options=sensor_cols)
+st.caption(f"Model: {model.model_name_for(selected_sensor)}")
 
-# Multi-step forecast
-FORECAST_STEPS = 20
-INTERVAL_MINUTES = 3
-multi_df = recursive_forecast(model, incoming_df, sensor_cols, feature_cols,
-                              selected_sensor, current_timestamp, steps=FORECAST_STEPS,
-                              interval_minutes=INTERVAL_MINUTES)
+if forecast_all is None:
+    # not published yet, the next auto-refresh picks it up
+    st.info("Forecast is being computed and will appear on the next refresh.")
+    latest = pd.DataFrame(columns=["location", "prediction"])
+    multi_df = pd.DataFrame(columns=["timestamp", "prediction"])
+else:
+    # 1-step prediction per sensor is the first forecast step
+    latest = pd.DataFrame({"location": sensor_cols, "prediction": forecast_all.iloc[0].values})
+    multi_df = pd.DataFrame({"timestamp": forecast_all.index,
+                             "prediction": forecast_all[selected_sensor].values})
 
 # Plot
 plot_crowd_data(selected_sensor, historic_data, current_data, latest, multi_df,
@@ -3,11 +3,15 @@
 # Shows NWB road segments colored by traffic_level for the
 # current 3-minute frame, advances automatically on refresh.
 
-import json, zipfile, time
+import zipfile, time
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import streamlit as st
 import pydeck as pdk
+from columnar_cache import read_csv_cached
+from carflow_index import CarflowFrames, RoadJoin, normalize_id, traffic_colors
+from road_geometry import RoadGeometry, read_road_geometry, viewport_bounds
 
 #check whether user is logged in. Only then the page is loaded - only activate upon final implementation
 from security import check_login_status 
@@ -37,17 +41,16 @@ def _file_mtime(p: Path) -> float:
     except Exception:
         return 0.0
 
-@st.cache_data(ttl=0)
-def load_carflow(path_str: str, mtime_key: float) -> pd.DataFrame:
+def load_carflow(path_str: str) -> pd.DataFrame:
     """
     Read a compact car-flow snapshot (CSV.GZ/Parquet) and:
       - parse time_utc to tz-aware datetimes,
       - create local time (Europe/Amsterdam),
       - group into 3-minute frames,
       - keep an id_str version for dict joins.
-    Caching is keyed by file mtime so it only reloads when the file changes.
+    The parsed columns are kept in a binary cache so a cold start skips the CSV parsing.
     """
-    df = pd.read_csv(
+    df = read_csv_cached(
         path_str,
         compression="infer",
         usecols=["time_utc", "id", "traffic_level"],
@@ -60,6 +63,14 @@ def load_carflow(path_str: str, mtime_key: float) -> pd.DataFrame:
     df["id_str"] = df["id"].astype("Int64").astype(str)
     return df
 
+@st.cache_resource
+def load_carflow_frames(path_str: str, mtime_key: float) -> CarflowFrames:
+    """
+    Loads the car-flow snapshot and pre-aggregates it once into a frame index (see CarflowFrames).
+    Caching is keyed by file mtime so it only reloads when the file changes; the raw rows are not kept.
+    """
+    return CarflowFrames(load_carflow(path_str))
+
 @st.cache_resource
 def list_shps_in_zip(zip_path: str):
     """List all .shp members inside the given ZIP (no extraction)."""
@@ -67,75 +78,56 @@ def list_shps_in_zip(zip_path: str):
         return [n for n in z.namelist() if n.lower().endswith(".shp")]
 
 @st.cache_resource
-def read_shp_as_geojson(zip_path: str, shp_inside: str):
+def load_road_geometry(zip_path: str, shp_inside: str) -> RoadGeometry:
     """
-    Read one shapefile member from the ZIP using GeoPandas, reproject to WGS84,
-    and return as a GeoJSON-like dict + feature list + property keys list.
+    Read one shapefile member from the ZIP using GeoPandas, reproject to WGS84 and keep it
+    as flat coordinate arrays + path offsets (full resolution and simplified per zoom level).
     """
-    import geopandas as gpd
-    g = gpd.read_file(f"zip://{zip_path}!{shp_inside}").to_crs(4326)
-    gj = json.loads(g.to_json())
-    feats = gj.get("features", [])
-    prop_names = set()
-    for f in feats[:1000]:
-        prop_names.update((f.get("properties") or {}).keys())
-    return gj, feats, sorted(prop_names)
-
-def color_from_tl(tl):
-    """Map traffic_level to RGBA (green→red)."""
-    if pd.isna(tl): return [180, 180, 180, 80]
-    if tl < 0.5:    return [46, 204, 113, 220]
-    if tl < 0.7:    return [241, 196, 15, 220]
-    if tl < 0.85:   return [230, 126, 34, 220]
-    return [231, 76, 60, 220]
+    return read_road_geometry(f"zip://{zip_path}!{shp_inside}")
 
-def detect_road_id_field(feats, id_candidates: set[str]) -> str:
+def detect_road_id_field(properties: pd.DataFrame, id_candidates: set[str]) -> str:
     """
     Pick the NWB property name most likely to hold the TomTom segment ID by
-    maximizing overlap with the set of IDs that have data in this frame.
+    maximizing overlap with the set of IDs that have car-flow data.
     Falls back to common field names if overlap is zero.
     """
+    sample = properties.head(5000)
     counts = {}
-    sample = feats[:5000] if len(feats) > 5000 else feats
-    prop_names = set()
-    for f in sample:
-        prop_names.update((f.get("properties") or {}).keys())
-    for name in prop_names:
-        overlap = 0
-        for f in sample:
-            props = f.get("properties") or {}
-            val = props.get(name)
-            if val is None:
-                continue
-            try:
-                s = str(int(val)) if isinstance(val, (int, float)) else str(val)
-            except Exception:
-                s = str(val)
-            if s in id_candidates:
-                overlap += 1
-        counts[name] = overlap
+    for name in sample.columns:
+        values = sample[name].dropna()
+        counts[name] = int(values.map(normalize_id).isin(id_candidates).sum())
     if counts:
         best = max(counts, key=counts.get)
         if counts[best] > 0:
             return best
     # common fallbacks
     for fb in ["WVK_ID", "WVKID", "wegvakid", "wegvak_id", "road_id", "ROAD_ID", "ID", "id"]:
-        if any(fb in (f.get("properties") or {}) for f in sample):
+        if fb in sample.columns:
             return fb
     # last resort: any property name
-    return next(iter(prop_names)) if prop_names else "id"
+    return sample.columns[0] if len(sample.columns) else "id"
+
+@st.cache_resource
+def build_road_join(zip_path: str, shp_inside: str, carflow_key: float, _cf: CarflowFrames) -> RoadJoin:
+    """
+    Join index between the road features of one (zip, shp) pair and the car-flow segment ids, built once.
+    The id field is detected against every segment id in the data, so it is keyed by the data file version too.
+    """
+    properties = load_road_geometry(zip_path, shp_inside).properties
+    road_id_field = detect_road_id_field(properties, set(_cf.segment_ids))
+    return RoadJoin(properties, _cf.segment_ids, road_id_field)
 
 # Guard: input files must exist / contain frames 
 if not DATA_PATH.exists():
     st.error("data/carflow_flat.csv.gz not found.")
     st.stop()
 mtime = _file_mtime(DATA_PATH)
-cf = load_carflow(str(DATA_PATH), mtime)
-if cf.empty:
+cf = load_carflow_frames(str(DATA_PATH), mtime)
+if cf.n_rows == 0:
     st.error("Car-flow file has no rows after parsing.")
     st.stop()
-frames = sorted(cf["frame_time"].dropna().unique())
-if not frames:
+frames = cf.frames
+if len(frames) == 0:
     st.error("No 3-minute frames found in car-flow data.")
     st.stop()
 
@@ -159,10 +151,8 @@ if TICK > st.session_state.last_tick:
 idx = st.session_state.frame_idx
 current_frame = frames[idx]
 
-# Aggregate traffic by segment for this frame 
-snap = cf[cf["frame_time"] == current_frame].copy()
-traffic_by_id = snap.groupby("id_str")["traffic_level"].mean().to_dict()
-ids_with_data = set(traffic_by_id.keys())
+# Mean traffic by segment for this frame (pre-aggregated, so this is a slice)
+_, frame_codes, frame_levels = cf.frame(idx)
 
 # Read NWB shapefile (from ZIP) 
 zip_path = "data/NWB_roads.zip"
@@ -177,83 +167,70 @@ if not shp_names:
 # Pick the first .shp inside the ZIP (simplest, no UI)
 shp_inside = shp_names[0]
 
-# Load shapefile geometry as GeoJSON-like dict
-roads, feats, prop_fields = read_shp_as_geojson(zip_path, shp_inside)
-if not feats:
+# Load the road geometry once as flat arrays (no GeoJSON round trip)
+roads = load_road_geometry(zip_path, shp_inside)
+if len(roads) == 0:
     st.error("Road geometry has no features.")
     st.stop()
 
-# Detect which NWB property holds the TomTom ID 
-road_id_field = detect_road_id_field(feats, ids_with_data)
-
-#  Build a filtered FeatureCollection with colors + width 
-view_feats = []
-for f in feats:
-    props = f.get("properties") or {}
-    raw_val = props.get(road_id_field)
-    if raw_val is None:
-        continue
-    try:
-        rid_str = str(int(raw_val)) if isinstance(raw_val, (int, float)) else str(raw_val)
-    except Exception:
-        rid_str = str(raw_val)
-
-    # keep only segments that have data in this frame
-    if rid_str not in ids_with_data:
-        continue
-
-    tl = float(traffic_by_id[rid_str])
-    new_props = dict(props)
-    new_props["rgba"] = color_from_tl(tl)  # color by traffic_level
-    new_props["width"] = 3.0               # constant line width
-
-    view_feats.append({
-        "type": "Feature",
-        "geometry": f.get("geometry"),
-        "properties": new_props,
-        "id": rid_str,                      # expose clean ID for tooltip
-        "traffic_level": round(tl, 2),      # expose rounded TL for tooltip
-    })
-
-roads_view = {"type": "FeatureCollection", "features": view_feats}
-
-# Map centering heuristic: first feature's first coordinate 
-lat0, lon0 = 52.37, 4.90  # Amsterdam fallback
-try:
-    g0 = next((g for g in view_feats if g.get("geometry", {}).get("coordinates")), None)
-    if g0:
-        geom = g0["geometry"]
-        if geom.get("type") == "LineString":
-            lon0, lat0 = geom["coordinates"][0]
-        elif geom.get("type") == "MultiLineString":
-            lon0, lat0 = geom["coordinates"][0][0]
-except Exception:
-    pass  # keep fallback center
+# Join index (segment id → feature) and the detected id field are cached per (zip, shp)
+road_join = build_road_join(zip_path, shp_inside, mtime, cf)
+road_id_field = road_join.id_field
+
+# Map view: pydeck doesn't report the viewport back to Python, so zoom and center are chosen here
+MAP_HEIGHT = 600      # px
+VIEW_WIDTH_PX = 1400  # assumed map width on a wide layout
+VIEW_MARGIN = 1.0     # also send one full viewport on every side, so panning/zooming out a bit doesn't show empty roads
+min_lon, min_lat, max_lon, max_lat = roads.bounds()
+st.sidebar.subheader("Map view")
+st.sidebar.caption("The map only loads the roads around the view set here. Dragging or zooming the map itself "
+                   "is not reported back, so move the view with these controls to load other areas.")
+zoom = st.sidebar.slider("Zoom", min_value=8, max_value=16, value=10)
+lat0 = st.sidebar.number_input("Center latitude", min_value=min_lat, max_value=max_lat,
+                               value=(min_lat + max_lat) / 2, step=0.005, format="%.4f")
+lon0 = st.sidebar.number_input("Center longitude", min_value=min_lon, max_value=max_lon,
+                               value=(min_lon + max_lon) / 2, step=0.005, format="%.4f")
+
+# Only the paths intersecting the viewport (grid index), simplified for the zoom; only the colours change per frame
+view = viewport_bounds(lat0, lon0, zoom, VIEW_WIDTH_PX * (1 + 2 * VIEW_MARGIN), MAP_HEIGHT * (1 + 2 * VIEW_MARGIN))
+in_view = roads.in_view(view)
+paths = roads.paths_for_zoom(zoom)
+feature_levels = road_join.frame_levels(frame_codes, frame_levels)
+path_levels = feature_levels[paths.path_feature[in_view]]
+has_data = ~np.isnan(path_levels)
+shown, path_levels = in_view[has_data], path_levels[has_data]
+roads_view = pd.DataFrame({
+    "path": paths.paths[shown],
+    "rgba": traffic_colors(path_levels).tolist(),                     # color by traffic_level
+    "id": road_join.feature_ids[paths.path_feature[shown]],           # expose clean ID for tooltip
+    "traffic_level": np.round(path_levels.astype(float), 2),          # expose rounded TL for tooltip
+})
+n_roads = len(np.unique(paths.path_feature[shown]))
 
 # PyDeck layer + deck 
 layer = pdk.Layer(
-    "GeoJsonLayer",
+    "PathLayer",
     roads_view,
-    stroked=True,
-    filled=False,
-    get_line_color="properties.rgba",
-    get_line_width="properties.width",
+    get_path="path",
+    get_color="rgba",
+    get_width=3,          # constant line width
+    width_units="pixels",
     pickable=True,
     auto_highlight=True,
 )
 
 deck = pdk.Deck(
     map_style=None,  # OSM default
-    initial_view_state=pdk.ViewState(latitude=lat0, longitude=lon0, zoom=10),
+    initial_view_state=pdk.ViewState(latitude=lat0, longitude=lon0, zoom=zoom),
     layers=[layer],
     tooltip={"html": "<b>ID:</b> {id}<br/><b>Traffic level:</b> {traffic_level}"},
 )
 
 #  Render map + footer 
-st.pydeck_chart(deck, use_container_width=True)
+st.pydeck_chart(deck, use_container_width=True, height=MAP_HEIGHT)
 
 st.caption(
     f"Auto-play (3-min) • Frame: {pd.Timestamp(current_frame).strftime('%Y-%m-%d %H:%M')} • "
-    f"Roads rendered: {len(view_feats):,} • "
-    f"Data range: {cf['time_local'].min():%Y-%m-%d %H:%M} → {cf['time_local'].max():%Y-%m-%d %H:%M}"
+    f"Roads rendered: {n_roads:,} (in view, zoom {zoom}) • "
+    f"Data range: {cf.time_min:%Y-%m-%d %H:%M} → {cf.time_max:%Y-%m-%d %H:%M}"
 )
\ No newline at end of file
@@ -0,0 +1,73 @@
+import numpy as np
+import plotly.graph_objects as go
+
+# About one point per pixel of a wide-layout chart; more points per line are not visible, so longer series are downsampled.
+# The default 24 h history (CROWD_HISTORY_HOURS, 480 rows of 3 minutes) stays below this and is drawn as is;
+# downsampling only starts for histories longer than ~50 h.
+CHART_WIDTH_PX = 1000
+POINTS_PER_PIXEL = 1
+MAX_POINTS = CHART_WIDTH_PX * POINTS_PER_PIXEL
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling: keeps the first and last point and, per bucket,
+    the point forming the largest triangle with the previous kept point and the next bucket's average.
+    Returns the indices of the kept points.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # n_out - 2 buckets between the first and last point
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for b in range(n_out - 2):
+        start, stop = edges[b], max(edges[b + 1], edges[b] + 1)
+        # average of the next bucket (the last point for the final bucket)
+        next_start, next_stop = stop, (edges[b + 2] if b + 2 < len(edges) else n)
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        keep[b + 1] = previous
+    return keep
+
+def minmax(y, n_out):
+    """Min/max decimation: the minimum and maximum of each of n_out // 2 buckets, in time order. Returns indices."""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    buckets = n_out // 2
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    lows = np.minimum.reduceat(y, edges[:-1])
+    highs = np.maximum.reduceat(y, edges[:-1])
+    keep = []
+    for start, stop, low, high in zip(edges[:-1], edges[1:], lows, highs):
+        segment = y[start:stop]
+        pair = (start + int(np.argmax(segment == low)), start + int(np.argmax(segment == high)))
+        keep.extend(sorted(set(pair)))
+    return np.asarray(keep)
+
+def downsample(x, y, max_points=MAX_POINTS, method="lttb"):
+    """Drops missing values and reduces one series to at most max_points points."""
+    valid = ~np.isnan(y)
+    x, y = x[valid], y[valid]
+    if len(y) <= max_points:
+        return x, y
+    keep = lttb(x.astype("int64").astype(float), y, max_points) if method == "lttb" else minmax(y, max_points)
+    return x[keep], y[keep]
+
+
+def line_figure(timestamps, values, names, max_points=MAX_POINTS, method="lttb", title=None):
+    """
+    Line chart with one WebGL (Scattergl) trace per column of values (rows x selected sensors).
+    Works straight on the NumPy arrays, so the cost depends on the selected sensors and points drawn only.
+    """
+    fig = go.Figure()
+    for column, name in enumerate(names):
+        x, y = downsample(timestamps, values[:, column], max_points, method)
+        fig.add_trace(go.Scattergl(x=x, y=y, mode="lines", name=name))
+    fig.update_layout(title=title)
+    return fig
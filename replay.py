@@ -0,0 +1,130 @@
+import threading
+import time
+import pandas as pd
+import streamlit as st
+
+# At 1x the replay shows one data row (3 minutes of data) per 5-second dashboard refresh, like the old cursor did
+SECONDS_PER_ROW = 5
+SPEEDS = [0.5, 1, 2, 5, 10, 30, 60]
+
+
+class ReplayClock:
+    """
+    Playback clock over the timestamps of the SensorStore, shared by every session and page.
+    The position follows the wall clock (anchor + elapsed time * speed), so a page that refreshes late
+    simply skips the frames it missed instead of falling behind. Seeking is a binary search on the index.
+    """
+
+    def __init__(self, index, speed=1.0, seconds_per_row=SECONDS_PER_ROW):
+        self.index = pd.DatetimeIndex(index)
+        self.seconds_per_row = seconds_per_row
+        self.speed = float(speed)
+        self.paused = False
+        # increased on every seek, so histories built from the replay know they must restart
+        # (a step forward just continues the history, a step back restarts it because time went backwards)
+        self.generation = 0
+        self._anchor_position = 0.0
+        self._anchor_wall = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.index)
+
+    def _position_at(self, now):
+        if self.paused:
+            return self._anchor_position
+        return self._anchor_position + (now - self._anchor_wall) * self.speed / self.seconds_per_row
+
+    def _reanchor(self, position):
+        # callers hold the lock
+        self._anchor_position = float(position) % len(self.index)
+        self._anchor_wall = time.monotonic()
+
+    def position(self):
+        """Row of the store that is on screen right now (wraps around at the end of the data)."""
+        with self._lock:
+            return int(self._position_at(time.monotonic())) % len(self.index)
+
+    def current(self):
+        """Current row position and its timestamp."""
+        position = self.position()
+        return position, self.index[position]
+
+    def seek(self, timestamp):
+        """Jumps to the last row at or before timestamp (the first row if it is earlier than the data)."""
+        timestamp = pd.Timestamp(timestamp)
+        if self.index.tz is not None and timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize(self.index.tz)
+        position = max(int(self.index.searchsorted(timestamp, side="right")) - 1, 0)
+        with self._lock:
+            self._reanchor(position)
+            self.generation += 1
+        return self.index[position]
+
+    def step(self, rows):
+        """Moves the clock by a number of rows, e.g. to step through a paused replay."""
+        with self._lock:
+            self._reanchor(int(self._position_at(time.monotonic())) + rows)
+
+    def set_speed(self, speed):
+        with self._lock:
+            self._reanchor(self._position_at(time.monotonic()))
+            self.speed = float(speed)
+
+    def pause(self):
+        with self._lock:
+            self._reanchor(int(self._position_at(time.monotonic())))
+            self.paused = True
+
+    def resume(self):
+        with self._lock:
+            self._reanchor(self._anchor_position)
+            self.paused = False
+
+
+@st.cache_resource
+def get_replay_clock():
+    """The one replay clock of this server process, so all pages show the same instant."""
+    from data_loader import load_sensor_store  # import here to avoid a circular import with data_loader
+    return ReplayClock(load_sensor_store().index)
+
+
+def _show_now():
+    st.session_state.last_refresh = 0.0  # show the new instant right away instead of at the next refresh
+
+def _toggle_play(clock):
+    clock.resume() if clock.paused else clock.pause()
+    _show_now()
+
+def _step(clock, rows):
+    clock.step(rows)
+    _show_now()
+
+def _set_speed(clock):
+    clock.set_speed(st.session_state.replay_speed)
+
+def replay_controls():
+    """Sidebar controls for the shared replay clock: play/pause, speed, stepping and jumping to a time."""
+    clock = get_replay_clock()
+    st.sidebar.subheader("Replay")
+
+    # callbacks run before the rerun, so the labels and the data already show the new state
+    play_col, back_col, forward_col = st.sidebar.columns(3)
+    play_col.button("▶" if clock.paused else "⏸", help="Play / pause the replay", on_click=_toggle_play, args=(clock,))
+    back_col.button("⏮", help="One frame back", on_click=_step, args=(clock, -1))
+    forward_col.button("⏭", help="One frame forward", on_click=_step, args=(clock, 1))
+
+    # another session may have changed the shared speed
+    st.session_state.replay_speed = clock.speed if clock.speed in SPEEDS else 1
+    st.sidebar.select_slider("Replay speed", options=SPEEDS, key="replay_speed",
+                             format_func=lambda s: f"{s:g}x", on_change=_set_speed, args=(clock,))
+
+    with st.sidebar.form("replay_seek"):
+        first, last = clock.index[0], clock.index[-1]
+        now = clock.current()[1]
+        day = st.date_input("Date", value=now.date(), min_value=first.date(), max_value=last.date())
+        at = st.time_input("Time", value=now.time(), step=180)
+        if st.form_submit_button("Jump to time"):
+            shown = clock.seek(pd.Timestamp.combine(day, at))
+            st.sidebar.success(f"Jumped to {shown:%Y-%m-%d %H:%M}")
+            _show_now()
@@ -0,0 +1,101 @@
+import threading
+import numpy as np
+import pandas as pd
+
+
+class RingBuffer:
+    """
+    Fixed-capacity, preallocated buffer of timestamped rows (one float column per sensor/feature).
+    Appends overwrite the oldest rows once the buffer is full, so memory stays constant however long it runs.
+    The ring has one slot more than the capacity and every row is written twice, at position p and p + size,
+    so the newest n rows are always one contiguous slice that view() can hand out without copying, and the next
+    append never lands in a full view.
+    Writers (ingest threads) and readers (dashboard sessions) share one instance; every access takes the lock.
+    """
+
+    def __init__(self, capacity, columns, dtype=np.float64):
+        self.capacity = int(capacity)
+        self.size = self.capacity + 1  # slots in the ring, see view()
+        self.columns = pd.Index(columns)
+        self.values = np.full((2 * self.size, len(self.columns)), np.nan, dtype=dtype)
+        self.timestamps = np.zeros(2 * self.size, dtype="datetime64[ns]")
+        self.total = 0  # rows appended since the start, including overwritten ones
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, timestamp, row):
+        self.append_many([timestamp], np.asarray(row, dtype=self.values.dtype).reshape(1, -1))
+
+    def _write(self, start, timestamps, rows):
+        # callers hold the lock; start + len(rows) <= size
+        stop = start + len(rows)
+        self.values[start:stop] = rows
+        self.values[start + self.size:stop + self.size] = rows
+        self.timestamps[start:stop] = timestamps
+        self.timestamps[start + self.size:stop + self.size] = timestamps
+
+    def append_many(self, timestamps, rows):
+        """Appends a batch of rows (n x columns) with one copy per contiguous part of the buffer."""
+        rows = np.asarray(rows, dtype=self.values.dtype)
+        timestamps = np.asarray(timestamps, dtype="datetime64[ns]")
+        # only the last `capacity` rows of a batch can survive
+        skipped = max(len(rows) - self.capacity, 0)
+        rows, timestamps = rows[skipped:], timestamps[skipped:]
+        with self._lock:
+            start = (self.total + skipped) % self.size
+            first = min(len(rows), self.size - start)
+            self._write(start, timestamps[:first], rows[:first])
+            # wrap around to the beginning of the buffer
+            self._write(0, timestamps[first:], rows[first:])
+            self.total += skipped + len(rows)
+
+    def last_timestamp(self):
+        with self._lock:
+            return pd.Timestamp(self.timestamps[(self.total - 1) % self.size]) if self.total else None
+
+    def latest(self):
+        """Newest row as ({column: [value]}, timestamp), or (None, None) while the buffer is empty."""
+        with self._lock:
+            if self.total == 0:
+                return None, None
+            position = (self.total - 1) % self.size
+            row = self.values[position].copy()
+            timestamp = pd.Timestamp(self.timestamps[position])
+        return {col: [val] for col, val in zip(self.columns, row)}, timestamp
+
+    def _newest(self, n):
+        # callers hold the lock; the newest n rows (all if None) as slices of the doubled arrays
+        n = len(self) if n is None else min(n, len(self))
+        start = (self.total - n) % self.size
+        return self.timestamps[start:start + n], self.values[start:start + n]
+
+    def view(self, n=None):
+        """
+        Zero-copy, read-only (timestamps, values) arrays of the newest n rows (all by default), oldest first.
+        They stay valid until capacity + 1 - n further rows are appended, so a view of the whole buffer only
+        survives one more append: readers that cannot rule out more concurrent writes should use snapshot().
+        """
+        with self._lock:
+            timestamps, values = self._newest(n)
+        timestamps.flags.writeable = False
+        values.flags.writeable = False
+        return timestamps, values
+
+    def frame(self, n=None, columns=None):
+        """The newest n rows as a DataFrame on top of view(), optionally limited to some columns."""
+        timestamps, values = self.view(n)
+        index = pd.DatetimeIndex(timestamps, name="timestamp")
+        if columns is None:
+            return pd.DataFrame(values, index=index, columns=self.columns, copy=False)
+        # a column selection has to gather the columns, so only the selected ones are copied
+        positions = self.columns.get_indexer(columns)
+        return pd.DataFrame(values[:, positions], index=index, columns=self.columns[positions])
+
+    def snapshot(self, n=None):
+        """Copy of the newest n rows (all by default), oldest first, as a DataFrame indexed by timestamp."""
+        # copied under the lock, so concurrent appends cannot overwrite rows halfway through
+        with self._lock:
+            timestamps, values = (array.copy() for array in self._newest(n))
+        return pd.DataFrame(values, index=pd.DatetimeIndex(timestamps, name="timestamp"), columns=self.columns)
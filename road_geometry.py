@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+# Zoom levels with a simplified copy of the road geometry; deeper zooms use the full resolution
+SIMPLIFY_ZOOMS = (8, 10, 12, 14)
+COORD_DECIMALS = 5  # ~1 m, keeps the coordinates short in the JSON sent to the browser
+GRID_CELL_DEG = 0.01  # spatial index cell, roughly 1 x 0.7 km around Amsterdam
+
+
+def tolerance_for_zoom(zoom):
+    """Half a screen pixel at this web-mercator zoom level, in degrees longitude."""
+    return 360.0 / (256 * 2 ** zoom) / 2
+
+def viewport_bounds(lat, lon, zoom, width_px, height_px):
+    """(min lon, min lat, max lon, max lat) that a web-mercator map of this size shows around (lat, lon)."""
+    world_px = 256 * 2 ** zoom
+    half_lon = width_px / 2 * 360.0 / world_px
+    y = np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))  # mercator y of the center, in radians
+    half_y = height_px / 2 * 2 * np.pi / world_px
+    lat_min, lat_max = np.degrees(2 * np.arctan(np.exp([y - half_y, y + half_y])) - np.pi / 2)
+    return lon - half_lon, float(lat_min), lon + half_lon, float(lat_max)
+
+
+class GridIndex:
+    """
+    Uniform grid over the bounding boxes of the paths: cell c lists its paths in
+    cell_paths[cell_offsets[c]:cell_offsets[c + 1]], so a viewport query only touches the cells it covers.
+    """
+
+    def __init__(self, bboxes, cell=GRID_CELL_DEG):
+        self.bboxes = bboxes  # (n, 4) min lon, min lat, max lon, max lat; NaN rows (empty paths) are not indexed
+        self.cell = cell
+        indexed = np.flatnonzero(np.isfinite(bboxes).all(axis=1))
+        boxes = bboxes[indexed]
+        self.origin = boxes[:, :2].min(axis=0) if len(boxes) else np.zeros(2)
+        extent = boxes[:, 2:].max(axis=0) - self.origin if len(boxes) else np.zeros(2)
+        self.n_cols, self.n_rows = (extent // cell).astype(int) + 1
+        x0, y0 = self._cells(boxes[:, 0], boxes[:, 1])
+        x1, y1 = self._cells(boxes[:, 2], boxes[:, 3])
+        # one (cell, path) entry for every cell a path's box covers
+        width, n = x1 - x0 + 1, (x1 - x0 + 1) * (y1 - y0 + 1)
+        path = np.repeat(indexed, n)
+        k = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        cell_key = (np.repeat(y0, n) + k // np.repeat(width, n)) * self.n_cols + np.repeat(x0, n) + k % np.repeat(width, n)
+        order = np.argsort(cell_key, kind="stable")
+        self.cell_paths = path[order]
+        self.cell_offsets = np.searchsorted(cell_key[order], np.arange(self.n_cols * self.n_rows + 1))
+
+    def _cells(self, lon, lat):
+        x = np.clip(((lon - self.origin[0]) // self.cell).astype(int), 0, self.n_cols - 1)
+        y = np.clip(((lat - self.origin[1]) // self.cell).astype(int), 0, self.n_rows - 1)
+        return x, y
+
+    def query(self, bounds):
+        """Sorted indices of the paths whose bounding box intersects bounds (min lon, min lat, max lon, max lat)."""
+        min_lon, min_lat, max_lon, max_lat = bounds
+        x0, y0 = self._cells(np.array([min_lon]), np.array([min_lat]))
+        x1, y1 = self._cells(np.array([max_lon]), np.array([max_lat]))
+        rows = np.arange(y0[0], y1[0] + 1) * self.n_cols
+        starts, stops = self.cell_offsets[rows + x0[0]], self.cell_offsets[rows + x1[0] + 1]
+        candidates = np.unique(np.concatenate([self.cell_paths[a:b] for a, b in zip(starts, stops)] or [[]])).astype(int)
+        # exact box test, also drops everything when the viewport lies outside the grid
+        box = self.bboxes[candidates]
+        hit = (box[:, 0] <= max_lon) & (box[:, 2] >= min_lon) & (box[:, 1] <= max_lat) & (box[:, 3] >= min_lat)
+        return candidates[hit]
+
+
+class RoadPaths:
+    """
+    One resolution of the road geometry in columnar form: all vertices in one (n, 2) lon/lat array,
+    an offsets array so that path i is coords[offsets[i]:offsets[i + 1]], and for every path the
+    feature (road) it belongs to. The per-path coordinate lists for the PathLayer are built once.
+    """
+
+    def __init__(self, coords, offsets, path_feature):
+        self.coords = coords
+        self.offsets = offsets
+        self.path_feature = path_feature
+        self.paths = np.empty(len(path_feature), dtype=object)
+        self.paths[:] = [coords[start:stop].tolist() for start, stop in zip(offsets[:-1], offsets[1:])]
+
+    def __len__(self):
+        return len(self.path_feature)
+
+    def bboxes(self):
+        """(n, 4) bounding box of every path: min lon, min lat, max lon, max lat."""
+        boxes = np.full((len(self), 4), np.nan)
+        # reduceat would hand an empty path a neighbour's vertex, so only the non-empty paths are reduced;
+        # their start offsets still delimit exactly their own vertices, since empty paths own none
+        filled = np.flatnonzero(self.offsets[1:] > self.offsets[:-1])
+        if len(filled):
+            boxes[filled, :2] = np.minimum.reduceat(self.coords, self.offsets[filled])
+            boxes[filled, 2:] = np.maximum.reduceat(self.coords, self.offsets[filled])
+        return boxes  # NaN for empty paths, which the grid index leaves out
+
+    @classmethod
+    def from_lines(cls, lines, line_feature):
+        """Builds the arrays from shapely LineStrings (one per path) and their feature index."""
+        import shapely  # import here so module doesn't hard-depend on shapely
+        coords, line_of_vertex = shapely.get_coordinates(lines, return_index=True)
+        offsets = np.searchsorted(line_of_vertex, np.arange(len(lines) + 1))
+        return cls(np.round(coords, COORD_DECIMALS), offsets, np.asarray(line_feature, dtype=np.int64))
+
+
+class RoadGeometry:
+    """
+    Road network stored once, without GeoJSON: the attribute table of the features plus the geometry as
+    RoadPaths at full resolution and Douglas–Peucker-simplified per zoom level (multi-lines become one path per part).
+    Path i is the same road part at every level, so one grid index over the full-resolution boxes serves them all.
+    """
+
+    def __init__(self, gdf, zooms=SIMPLIFY_ZOOMS):
+        import shapely  # import here so module doesn't hard-depend on shapely
+        self.properties = pd.DataFrame(gdf.drop(columns=gdf.geometry.name)).reset_index(drop=True)
+        lines, line_feature = shapely.get_parts(gdf.geometry.to_numpy(), return_index=True)
+        self.full = RoadPaths.from_lines(lines, line_feature)
+        self.levels = {}
+        for zoom in zooms:
+            simplified = shapely.simplify(lines, tolerance_for_zoom(zoom), preserve_topology=False)
+            self.levels[zoom] = RoadPaths.from_lines(simplified, line_feature)
+        self.index = GridIndex(self.full.bboxes())
+
+    def __len__(self):
+        return len(self.properties)
+
+    def paths_for_zoom(self, zoom):
+        """The coarsest resolution that still looks exact at this zoom level."""
+        for level in sorted(self.levels):
+            if zoom <= level:
+                return self.levels[level]
+        return self.full
+
+    def bounds(self):
+        """(min lon, min lat, max lon, max lat) of the whole network."""
+        boxes = self.index.bboxes
+        return tuple(float(v) for v in (*np.nanmin(boxes[:, :2], axis=0), *np.nanmax(boxes[:, 2:], axis=0)))
+
+    def in_view(self, bounds):
+        """Indices of the paths that intersect the viewport bounds."""
+        return self.index.query(bounds)
+
+
+def read_road_geometry(path, zooms=SIMPLIFY_ZOOMS):
+    """Reads a road shapefile (also zip://...!member.shp) into a RoadGeometry in WGS84."""
+    import geopandas as gpd  # import here so module doesn't hard-depend on geopandas
+    return RoadGeometry(gpd.read_file(path).to_crs(4326), zooms)
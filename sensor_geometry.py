@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# Columns every sensor needs before it can be drawn on the map
+REQUIRED_COLUMNS = ['Lat', 'Lon', 'Locatienaam', 'Objectummer']
+WIDTH_COLUMN = "Effectieve\xa0 breedte"  # the file uses a non-breaking space in this header
+
+
+def _read_only(values):
+    values = np.ascontiguousarray(values)
+    values.flags.writeable = False
+    return values
+
+
+class SensorGeometry:
+    """
+    Validated, immutable table of the sensor locations, built once when the location file is loaded.
+    Holds parsed coordinates, effective widths and directions as float arrays in file order,
+    plus the validity masks and missing rows, so map layers and the crowd flow only index it.
+    """
+
+    def __init__(self, sensor_loc):
+        frame = sensor_loc.reset_index(drop=True)
+        lat_lon = frame['Lat/Long'].str.split(',', expand=True).reindex(columns=[0, 1])
+        frame['Lat'] = lat_lon[0].astype(float)
+        frame['Lon'] = lat_lon[1].astype(float)
+
+        self.sensor_ids = _read_only(frame['sensor_id_full'].astype(str).to_numpy(dtype=object))
+        self.lat = _read_only(frame['Lat'].to_numpy(dtype=float))
+        self.lon = _read_only(frame['Lon'].to_numpy(dtype=float))
+        self.direction = _read_only(pd.to_numeric(frame['sensor_direction'], errors='coerce').to_numpy(dtype=float))
+        # the widths are stored with a "," instead of a "." as decimal separator
+        widths = frame[WIDTH_COLUMN]
+        if not pd.api.types.is_numeric_dtype(widths):
+            widths = widths.str.replace(",", ".").astype(float)
+        self.width = _read_only(widths.to_numpy(dtype=float))
+        self.names = _read_only(frame['Locatienaam'].astype(str).to_numpy(dtype=object))
+        self.objects = _read_only(frame['Objectummer'].astype(str).to_numpy(dtype=object))
+
+        # sensors with missing critical data are skipped by every layer (arrows also need a direction)
+        self.valid = _read_only(~frame[REQUIRED_COLUMNS].isnull().any(axis=1).to_numpy())
+        self.valid_direction = _read_only(self.valid & ~np.isnan(self.direction))
+        self.missing_rows = tuple(np.flatnonzero(~self.valid).tolist())
+        self.missing_direction_rows = tuple(np.flatnonzero(~self.valid_direction).tolist())
+
+        # position of every sensor id (the first one wins for duplicates)
+        self.positions = {}
+        for position, sensor_id in enumerate(self.sensor_ids):
+            self.positions.setdefault(sensor_id, position)
+        self.frame = frame
+
+    def __len__(self):
+        return len(self.sensor_ids)
+
+    def values_for(self, sensor_data, default=np.nan):
+        """Current value of every sensor in table order, taken from a {sensor_id: [value]} dict."""
+        return np.array([sensor_data.get(sensor_id, [default])[0] for sensor_id in self.sensor_ids], dtype=float)
+
+    def widths_for(self, sensor_ids):
+        """Effective width per sensor id; ids without a location row get NaN."""
+        positions = np.array([self.positions.get(sensor_id, -1) for sensor_id in sensor_ids], dtype=int)
+        return np.where(positions >= 0, self.width[positions], np.nan), positions >= 0
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+
+class SensorStore:
+    """
+    Read-only, timestamp-indexed copy of the merged crowd and weather data.
+    One instance is shared by every Streamlit session, so nothing in here may be modified after loading.
+    Sessions only keep an integer cursor into the store.
+    """
+
+    def __init__(self, df):
+        # sort once so positions and binary searches on the index line up with the data
+        df = df.sort_index()
+        self.index = pd.DatetimeIndex(df.index, name="timestamp")
+        self.columns = df.columns
+        # one contiguous float block for all columns, shared by every session
+        self.values = np.ascontiguousarray(df.to_numpy(dtype=float))
+        self.values.flags.writeable = False
+        # DataFrame view on the same memory for code that works with pandas
+        self.frame = pd.DataFrame(self.values, index=self.index, columns=self.columns, copy=False)
+
+    def __len__(self):
+        return len(self.index)
+
+    def row(self, position):
+        """Returns the sensor data of one row as {column: [value]} together with its timestamp."""
+        values = self.values[position]
+        return {col: [val] for col, val in zip(self.columns, values)}, self.index[position]
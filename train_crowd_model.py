@@ -0,0 +1,181 @@
+# train_crowd_model.py
+# --- Scripted version of Notebooks/XGB_Model_Training.ipynb: rolling-origin backtests + hyperparameter grid
+#     across all cores, writes a leaderboard and the best model (pickle + native XGBoost format) ---
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import itertools
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from columnar_cache import CACHE_DIR, read_csv_cached
+from feature_builder import create_features
+
+#  Paths / defaults
+DATA_FILE   = os.getenv("CROWD_DATA", "data/crowd_weather_merged.csv")
+MODEL_OUT   = os.getenv("CROWD_MODEL_OUT", "Notebooks/crowd_count_model_retrained.pkl")  # never the deployed model by default
+LEADERBOARD = os.getenv("CROWD_LEADERBOARD", "Notebooks/crowd_model_leaderboard.csv")
+N_FEATURE_COLS = 14  # weather + time columns at the end of the merged data
+
+# Notebook settings plus a small neighbourhood around them
+DEFAULT_GRID = {
+    "n_estimators": [300, 600],
+    "max_depth": [4, 6, 8],
+    "learning_rate": [0.05, 0.1],
+    "subsample": [0.9],
+    "colsample_bytree": [0.8],
+}
+
+TARGET = "count"
+NON_FEATURES = ["count", "location", "timestamp"]
+
+
+# Feature matrix: built once per data file version and cached, so folds and workers never rebuild it
+def build_feature_matrix(data_file: str = DATA_FILE) -> Path:
+    stat = os.stat(data_file)
+    out = CACHE_DIR / f"features.{Path(data_file).name}.{stat.st_mtime_ns}.{stat.st_size}.pkl"
+    if out.exists():
+        return out
+    df = read_csv_cached(data_file)
+    sensor_cols = df.columns[1:-N_FEATURE_COLS]  # first column is the timestamp
+    feature_cols = df.columns[-N_FEATURE_COLS:]
+    features = create_features(df, sensor_cols, feature_cols, dropna=True)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    features.reset_index(drop=True).to_pickle(out)
+    print(f"[features] {len(features):,} rows → {out}", flush=True)
+    return out
+
+
+def rolling_origin_splits(timestamps: pd.Series, n_folds: int, test_hours: float):
+    """
+    Expanding-window splits: fold k trains on everything before its cutoff and tests on the next test_hours.
+    The last fold ends at the last timestamp. Returns a list of (cutoff, end) pairs.
+    """
+    horizon = pd.Timedelta(hours=test_hours)
+    end = timestamps.max() + pd.Timedelta(microseconds=1)
+    splits = []
+    for k in range(n_folds, 0, -1):
+        cutoff = end - k * horizon
+        if cutoff <= timestamps.min():
+            raise ValueError(f"Not enough history for {n_folds} folds of {test_hours} hours")
+        splits.append((cutoff, cutoff + horizon))
+    return splits
+
+
+def param_grid(grid: dict):
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+#  Worker side: every process loads the feature matrix once
+_FEATURES = None
+
+def _init_worker(feature_file: str):
+    global _FEATURES
+    _FEATURES = pd.read_pickle(feature_file)
+
+def _fit(params: dict, X, y, n_jobs: int):
+    from xgboost import XGBRegressor  # import here so module doesn't hard-depend on xgboost
+    model = XGBRegressor(objective="reg:squarederror", n_jobs=n_jobs, **params)
+    model.fit(X, y)
+    return model
+
+def _run_fold(params_id: int, params: dict, fold_id: int, cutoff, end):
+    df = _FEATURES
+    train = df[df["timestamp"] < cutoff]
+    test = df[(df["timestamp"] >= cutoff) & (df["timestamp"] < end)]
+    model = _fit(params, train.drop(columns=NON_FEATURES), train[TARGET], n_jobs=1)
+    err = model.predict(test.drop(columns=NON_FEATURES)) - test[TARGET].to_numpy()
+    per_sensor = (
+        pd.DataFrame({"location": test["location"].to_numpy(), "abs_err": np.abs(err), "sq_err": err ** 2})
+        .groupby("location")
+        .agg(MAE=("abs_err", "mean"), MSE=("sq_err", "mean"))
+    )
+    per_sensor["RMSE"] = np.sqrt(per_sensor.pop("MSE"))
+    per_sensor = per_sensor.reset_index().assign(params_id=params_id, fold=fold_id)
+    summary = {"params_id": params_id, "fold": fold_id, "cutoff": cutoff,
+               "MAE": float(np.abs(err).mean()), "RMSE": float(np.sqrt((err ** 2).mean())),
+               "n_train": len(train), "n_test": len(test)}
+    return summary, per_sensor
+
+
+#  Driver
+def backtest(data_file: str = DATA_FILE, grid: dict = None, n_folds: int = 3, test_hours: float = 12,
+             workers: int = None, leaderboard_path: str = LEADERBOARD, model_out: str = MODEL_OUT):
+    """
+    Runs every (parameter set, fold) pair in a process pool, writes the leaderboard (mean over folds, best first)
+    and per-sensor metrics, then refits the best parameters on all data and saves the model.
+    """
+    t0 = time.time()
+    feature_file = build_feature_matrix(data_file)
+    features = pd.read_pickle(feature_file)
+    splits = rolling_origin_splits(features["timestamp"], n_folds, test_hours)
+    candidates = param_grid(grid or DEFAULT_GRID)
+    workers = workers or os.cpu_count() or 1
+    print(f"[backtest] {len(candidates)} parameter sets × {len(splits)} folds on {workers} workers", flush=True)
+
+    summaries, sensor_metrics = [], []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(str(feature_file),)) as pool:
+        futures = [pool.submit(_run_fold, p_id, params, f_id, cutoff, end)
+                   for p_id, params in enumerate(candidates)
+                   for f_id, (cutoff, end) in enumerate(splits)]
+        for done, future in enumerate(as_completed(futures), start=1):
+            summary, per_sensor = future.result()
+            summaries.append(summary)
+            sensor_metrics.append(per_sensor)
+            print(f"[backtest] {done}/{len(futures)} params={summary['params_id']} fold={summary['fold']} "
+                  f"RMSE={summary['RMSE']:.2f}", flush=True)
+
+    folds = pd.DataFrame(summaries)
+    leaderboard = (
+        folds.groupby("params_id")
+        .agg(MAE=("MAE", "mean"), RMSE=("RMSE", "mean"), RMSE_std=("RMSE", "std"))
+        .join(pd.DataFrame(candidates).rename_axis("params_id"))
+        .sort_values("RMSE")
+        .reset_index()
+    )
+    Path(leaderboard_path).parent.mkdir(parents=True, exist_ok=True)
+    leaderboard.to_csv(leaderboard_path, index=False)
+
+    best_id = int(leaderboard.loc[0, "params_id"])
+    sensors = pd.concat(sensor_metrics, ignore_index=True)
+    sensors = sensors[sensors["params_id"] == best_id].groupby("location")[["MAE", "RMSE"]].mean().sort_values("RMSE")
+    sensors.to_csv(Path(leaderboard_path).with_name(Path(leaderboard_path).stem + "_per_sensor.csv"))
+    print(f"[backtest] leaderboard → {leaderboard_path}", flush=True)
+
+    # Refit the winner on all data with every core
+    best_params = candidates[best_id]
+    model = _fit(best_params, features.drop(columns=NON_FEATURES), features[TARGET], n_jobs=-1)
+    save_model(model, model_out)
+    print(f"[train] best params {json.dumps(best_params)} → {model_out} ({time.time() - t0:.0f}s total)", flush=True)
+    return leaderboard
+
+
+def save_model(model, model_out: str = MODEL_OUT):
+    """Saves the sklearn model as a pickle (notebook compatible) and in XGBoost's native format for the dashboard."""
+    import joblib
+    from crowd_model import save_native_model
+    Path(model_out).parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(model, model_out)
+    save_native_model(model.get_booster(), model_out)
+
+
+# ---------- CLI: run this file to retrain the crowd model ----------
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Backtest and retrain the XGBoost crowd count model.")
+    ap.add_argument("--data", default=DATA_FILE, help="Merged crowd + weather CSV.")
+    ap.add_argument("--folds", type=int, default=3, help="Number of rolling-origin folds.")
+    ap.add_argument("--test-hours", type=float, default=12, help="Length of each test window in hours.")
+    ap.add_argument("--grid", default=None, help="JSON file with a parameter grid ({param: [values]}).")
+    ap.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    ap.add_argument("--leaderboard", default=LEADERBOARD, help="Output leaderboard CSV.")
+    ap.add_argument("--model-out", default=MODEL_OUT, help="Output model path (.pkl, native .ubj written next to it). "
+                         "Defaults to a new file; pass Notebooks/crowd_count_model.pkl to replace the dashboard model.")
+    args = ap.parse_args()
+
+    grid = json.loads(Path(args.grid).read_text()) if args.grid else None
+    backtest(data_file=args.data, grid=grid, n_folds=args.folds, test_hours=args.test_hours,
+             workers=args.workers, leaderboard_path=args.leaderboard, model_out=args.model_out)